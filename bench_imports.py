@@ -0,0 +1,93 @@
+""" Import-time benchmark
+
+    Measures, in fresh interpreters, the cold import time of the project modules and which
+    heavy dependencies each of them pulls in, then the cost of starting spawned worker
+    processes that import the backtester (what a process pool pays per worker).
+
+    Usage: python bench_imports.py [--repeat 5] [--workers 4]
+"""
+import argparse
+import json
+import multiprocessing
+import statistics
+import subprocess
+import sys
+import time
+import os
+
+MODULES = [
+    "utilities.cache",
+    "utilities.bt_engine",
+    "utilities.data_manager",
+    "utilities.custom_indicators",
+    "main_backtester",
+]
+
+HEAVY_DEPENDENCIES = ["ccxt", "vectorbtpro", "requests"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [dep for dep in {heavy!r} if dep in sys.modules]}}))
+"""
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def cold_import(module, repeat):
+    """Import module in `repeat` fresh interpreters, return the timings and the heavy modules it loaded."""
+    timings = []
+    loaded = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_DEPENDENCIES)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded = result["loaded"]
+    return timings, loaded
+
+
+def _ready(_):
+    return os.getpid()
+
+
+def spawn_cost(workers, initializer_module=None):
+    """Seconds to start a spawn pool whose workers import initializer_module, until every worker answered."""
+    import importlib
+
+    ctx = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    kwargs = {"initializer": importlib.import_module, "initargs": (initializer_module,)} if initializer_module else {}
+    with ctx.Pool(workers, **kwargs) as pool:
+        pids = set()
+        while len(pids) < workers:
+            pids.update(pool.map(_ready, range(workers * 4), chunksize=1))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--workers", type=int, default=4, help="spawned workers for the pool benchmark")
+    args = parser.parse_args()
+
+    print(f"Cold import ({args.repeat} runs, seconds)")
+    print(f"{'module':32} {'min':>8} {'median':>8}  heavy dependencies loaded")
+    for module in MODULES:
+        timings, loaded = cold_import(module, args.repeat)
+        print(f"{module:32} {min(timings):8.3f} {statistics.median(timings):8.3f}  {', '.join(loaded) or '-'}")
+
+    sys.path.insert(0, ROOT)
+    bare = spawn_cost(args.workers)
+    backtester = spawn_cost(args.workers, "main_backtester")
+    print(f"\nSpawn pool of {args.workers} workers (seconds)")
+    print(f"{'bare interpreter':32} {bare:8.3f}")
+    print(f"{'importing main_backtester':32} {backtester:8.3f}  (+{(backtester - bare) / args.workers:.3f} per worker)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+""" Indicator kernels benchmark and equivalence checks
+
+    Runs SuperTrend, MaSlope, SmoothedHeikinAshi and heikinAshiDf on synthetic candles with
+    their array kernels (utilities/kernels.py) and with the reference pandas loops, checks
+    that both give the same values and prints the speedup. Then does the same for the
+    moving average matrices of utilities/ma_matrix.py against ta called window by window,
+    over the trix and long MA grids of the backtester, and for the incremental states of
+    utilities/streaming.py fed candle by candle after a warm-up on the first half.
+
+    Usage: python bench_indicators.py [--bars 100000]
+"""
+import argparse
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import ta
+
+from utilities.custom_indicators import MaSlope, SmoothedHeikinAshi, SuperTrend, Trix, heikinAshiDf, heikinAshiDf_reference
+from utilities.ma_matrix import ema_matrix, sma_matrix, trix_grid
+from utilities.streaming import LongMaState, TrixState
+
+TRIX_LENGTHS = list(range(5, 61, 5))
+SIGNAL_LENGTHS = [7, 14, 21, 28]
+LONG_MA_LENGTHS = list(range(100, 1001, 100))
+
+
+def synthetic_candles(bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    open = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.005, bars)) * close
+    return pd.DataFrame({
+        "open": open,
+        "high": np.maximum(open, close) + spread,
+        "low": np.minimum(open, close) - spread,
+        "close": close,
+        "volume": rng.exponential(100, bars),
+    }, index=pd.date_range("2017-01-01", periods=bars, freq="1min", name="date"))
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def same(left, right):
+    left = np.asarray(left, dtype=np.float64)
+    right = np.asarray(right, dtype=np.float64)
+    return left.shape == right.shape and np.array_equal(left, right, equal_nan=True)
+
+
+def cases(df):
+    """(name, kernel run, reference run, outputs to compare)"""
+    return [
+        (
+            "SuperTrend",
+            lambda: SuperTrend(df.high, df.low, df.close),
+            lambda: SuperTrend(df.high, df.low, df.close, reference=True),
+            lambda st: [st.super_trend_direction(), st.super_trend_upper(), st.super_trend_lower()],
+        ),
+        (
+            "MaSlope",
+            lambda: MaSlope(df.close, df.high, df.low),
+            lambda: MaSlope(df.close, df.high, df.low, reference=True),
+            lambda ma: [ma.ma_line(), ma.x_angle()],
+        ),
+        (
+            "SmoothedHeikinAshi",
+            lambda: SmoothedHeikinAshi(df.open, df.high, df.low, df.close),
+            lambda: SmoothedHeikinAshi(df.open, df.high, df.low, df.close, reference=True),
+            lambda ha: [ha.ha_open, ha.smoothed_ha_open(), ha.smoothed_ha_close()],
+        ),
+        (
+            "heikinAshiDf",
+            lambda: heikinAshiDf(df.copy()),
+            lambda: heikinAshiDf_reference(df.copy()),
+            lambda ha: [ha.HA_Open, ha.HA_High, ha.HA_Low],
+        ),
+    ]
+
+
+def matrix_cases(df):
+    """(name, matrix run, per-window reference run) returning arrays of the same shape"""
+    close = df.close
+
+    def per_window(indicator, windows):
+        return lambda: np.column_stack([indicator(close, window=window).to_numpy() for window in windows])
+
+    def trix_reference(signal_type):
+        return lambda: np.stack([
+            np.column_stack([
+                Trix(close, trix_length, signal_length, signal_type).get_trix_histo().to_numpy()
+                for signal_length in SIGNAL_LENGTHS
+            ])
+            for trix_length in TRIX_LENGTHS
+        ], axis=1)
+
+    return [
+        ("ema_matrix", lambda: ema_matrix(close, LONG_MA_LENGTHS), per_window(ta.trend.ema_indicator, LONG_MA_LENGTHS)),
+        ("sma_matrix", lambda: sma_matrix(close, LONG_MA_LENGTHS), per_window(ta.trend.sma_indicator, LONG_MA_LENGTHS)),
+        ("trix_grid sma", lambda: trix_grid(close, TRIX_LENGTHS, SIGNAL_LENGTHS, "sma"), trix_reference("sma")),
+        ("trix_grid ema", lambda: trix_grid(close, TRIX_LENGTHS, SIGNAL_LENGTHS, "ema"), trix_reference("ema")),
+    ]
+
+
+def streaming_cases(df):
+    """(name, new state, batch values over the whole history)"""
+    close = df.close
+    return [
+        ("TrixState sma", lambda: TrixState(9, 21, "sma"), lambda: Trix(close, 9, 21, "sma").get_trix_histo()),
+        ("TrixState ema", lambda: TrixState(9, 21, "ema"), lambda: Trix(close, 9, 21, "ema").get_trix_histo()),
+        ("LongMaState", lambda: LongMaState(500), lambda: ta.trend.ema_indicator(close, window=500)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=100_000, help="number of synthetic candles")
+    args = parser.parse_args()
+
+    # The reference loops index Series by position, which pandas warns about
+    warnings.simplefilter("ignore", FutureWarning)
+    df = synthetic_candles(args.bars)
+
+    print(f"{args.bars} bars (seconds)")
+    print(f"{'indicator':20} {'kernel':>9} {'reference':>10} {'speedup':>9}  equal")
+    all_equal = True
+    for name, kernel_run, reference_run, outputs in cases(df):
+        kernel_run()  # compiles the kernel when numba is installed
+        kernel, kernel_time = timed(kernel_run)
+        reference, reference_time = timed(reference_run)
+        equal = all(same(left, right) for left, right in zip(outputs(kernel), outputs(reference)))
+        all_equal &= equal
+        print(f"{name:20} {kernel_time:9.4f} {reference_time:10.4f} {reference_time / kernel_time:8.0f}x  {equal}")
+
+    print(f"\n{'matrix':20} {'matrix':>9} {'ta':>10} {'speedup':>9}  equal")
+    for name, matrix_run, reference_run in matrix_cases(df):
+        matrix_run()
+        matrix, matrix_time = timed(matrix_run)
+        reference, reference_time = timed(reference_run)
+        equal = same(matrix, reference)
+        all_equal &= equal
+        print(f"{name:20} {matrix_time:9.4f} {reference_time:10.4f} {reference_time / matrix_time:8.0f}x  {equal}")
+
+    closes = df.close.to_numpy()
+    warm_up = len(closes) // 2
+    print(f"\n{'streaming':20} {'us/update':>9}  equal")
+    for name, new_state, batch_run in streaming_cases(df):
+        state = new_state()
+        values = list(state.warm_up(closes[:warm_up]))
+        start = time.perf_counter()
+        values.extend(state.update(close) for close in closes[warm_up:])
+        per_update = (time.perf_counter() - start) / max(len(closes) - warm_up, 1)
+        equal = same(values, batch_run())
+        all_equal &= equal
+        print(f"{name:20} {per_update * 1e6:9.2f}  {equal}")
+
+    sys.exit(0 if all_equal else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+""" Successive-halving optimizer benchmark
+
+    Runs the exhaustive input_data Trix grid and the successive-halving search of
+    utilities/optimizer.py on the same synthetic candles with the batch engine, then prints
+    the backtests each one needed, the time they took and how many of the exhaustive top-k
+    configurations the search found.
+
+    Usage: python bench_optimizer.py [--bars 30000] [--top 10] [--keep 0.5]
+"""
+import argparse
+import itertools
+import time
+import warnings
+
+import pandas as pd
+
+import input_data
+from bench_indicators import synthetic_candles
+from main_backtester import BatchStrategy
+from utilities.optimizer import SuccessiveHalving
+
+METRIC = "sharpe_ratio"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=30_000, help="number of synthetic hourly candles")
+    parser.add_argument("--top", type=int, default=10, help="size of the top-k compared")
+    parser.add_argument("--keep", type=float, default=0.5, help="fraction kept at each rung")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", RuntimeWarning)
+    df = synthetic_candles(args.bars)
+    df.index = pd.date_range("2019-06-01", periods=len(df), freq="1h", name="date")
+    grid = {
+        "trix_length": input_data.trix_lengths,
+        "trix_signal_length": input_data.trix_signal_lengths,
+        "trix_signal_type": input_data.trix_signal_types,
+        "long_ma_length": input_data.long_ma_lengths,
+        "size": input_data.size,
+    }
+    first_bar = df.index[df.index >= "2020-01-01"][0]
+    last_bar = df.index[-1]
+
+    def evaluate(params_list, window):
+        strategy = BatchStrategy(df, ["long"], params_list)
+        strategy.populate_indicators()
+        return strategy.run_backtest(start_date=last_bar - (last_bar - first_bar) * window)
+
+    start = time.perf_counter()
+    params_list = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    exhaustive = evaluate(params_list, 1).sort_values(METRIC, ascending=False, kind="stable")
+    exhaustive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    optimizer = SuccessiveHalving(grid, evaluate, metric=METRIC, keep=args.keep)
+    searched = optimizer.run()
+    search_time = time.perf_counter() - start
+
+    def keys(df):
+        return [tuple(row) for row in df[list(grid)].head(args.top).itertuples(index=False)]
+
+    found = len(set(keys(exhaustive)) & set(keys(searched)))
+    print(optimizer.report())
+    print(f"\n{'':14} {'backtests':>9} {'seconds':>8} {'best ' + METRIC:>18}")
+    print(f"{'exhaustive':14} {len(exhaustive):9} {exhaustive_time:8.2f} {exhaustive[METRIC].iloc[0]:18.4f}")
+    print(f"{'halving':14} {sum(r['backtests'] for r in optimizer.history):9} {search_time:8.2f} {searched[METRIC].iloc[0]:18.4f}")
+    print(f"\n{found} of the exhaustive top {args.top} found by the search")
+
+
+if __name__ == "__main__":
+    main()
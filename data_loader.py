@@ -2,8 +2,9 @@ import asyncio
 import platform
 from utilities.data_manager import ExchangeDataManager
 import os
+import json
+import time
 from vectorbtpro import *
-import hashlib
 import numpy as np
 import pandas as pd
 
@@ -31,18 +32,70 @@ class DataLoader:
 
 
 class DataLoaderVBT:
-    def __init__(self, start_date, end_date, path):
+    """ Binance data for vectorbtpro, assembled from a local per-(symbol, timeframe) store
+
+        Each symbol/timeframe pair is kept in its own HDF file together with the date range it
+        covers, so a request only pulls the symbols that were never fetched and the date ranges
+        that are not covered yet (usually the recent tail). The list of Binance symbols is cached
+        on disk for symbols_ttl seconds.
+    """
+
+    def __init__(self, start_date, end_date, path, symbols_ttl=24 * 3600):
         self.start_date = start_date
         self.end_date = end_date
         self.path = path
+        self.symbols_ttl = symbols_ttl
+
+    # === Symbol listing ===
+    def list_symbols(self, refresh=False):
+        """Binance symbols, from the on-disk cache unless it is older than symbols_ttl."""
+        cache_file = os.path.join(self.path, "binance_symbols.json")
+        if not refresh and os.path.exists(cache_file):
+            with open(cache_file) as f:
+                cached = json.load(f)
+            if time.time() - cached["fetched_at"] < self.symbols_ttl:
+                return cached["symbols"]
+
+        symbols = list(vbt.BinanceData.list_symbols("*"))
+        os.makedirs(self.path, exist_ok=True)
+        self._write_json(cache_file, {"fetched_at": time.time(), "symbols": symbols})
+        return symbols
+
+    # === Per-symbol store ===
+    def _symbol_file(self, symbol, tf):
+        return os.path.join(self.path, f"{symbol}_{tf}.h5")
+
+    def _store_index_file(self):
+        return os.path.join(self.path, "store_index.json")
+
+    def _load_store_index(self):
+        if not os.path.exists(self._store_index_file()):
+            return {}
+        with open(self._store_index_file()) as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write_json(file_name, content):
+        tmp_file = file_name + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(content, f)
+        os.replace(tmp_file, file_name)
+
+    def _missing_ranges(self, covered, start, end):
+        """Date ranges of [start, end] not covered by the stored range (None if nothing is stored)."""
+        if covered is None:
+            return [(start, end)]
+        covered_start, covered_end = pd.Timestamp(covered["start"]), pd.Timestamp(covered["end"])
+        ranges = []
+        if start < covered_start:
+            ranges.append((start, covered_start))
+        if end > covered_end:
+            ranges.append((covered_end, end))
+        return ranges
 
     # === Data Fetching and Storage ===
     def fetch_data(self, symbols, tf):
-        # Convert the list of symbols into a string separated by '-'
-
-        lst_symbols_binance = vbt.BinanceData.list_symbols("*")
-
-        # kas_symbols = [symbol for symbol in lst_symbols_binance if symbol.startswith('KAS')]
+        lst_symbols_binance = set(self.list_symbols())
 
         # Filter symbols to include only those present in lst_symbols_binance
         filtered_symbols = [symbol for symbol in symbols if symbol in lst_symbols_binance]
@@ -53,41 +106,52 @@ class DataLoaderVBT:
         print("Filtered symbols:", symbols)
         print("Removed symbols:", removed_symbols)
 
-        symbols_str = '-'.join(symbols)
-        timeframe_str = '-'.join(tf)
-
-
-        # Remove any unwanted characters from start_date and end_date
-        start_date_str = self.start_date.replace('-', '')
-        end_date_str = self.end_date.replace('-', '')
-
-        # Ensure the directory exists
-        if not os.path.exists(self.path):
-            os.makedirs(self.path)
-
-        # Generate the filename
-        filename = os.path.join(self.path, f"{symbols_str}_{timeframe_str}_{start_date_str}_{end_date_str}.h5")
-
-        # Create a hash of the symbols for uniqueness
-        symbols_hash = hashlib.md5(symbols_str.encode()).hexdigest()
-
-        # Generate the filename with the hash
-        filename = os.path.join(self.path, f"{symbols_hash}_{timeframe_str}_{start_date_str}_{end_date_str}.h5")
-
-        if os.path.exists(filename):
-            # data = vbt.HDFData.pull(filename)
-            data = vbt.BinanceData.from_hdf(filename)
-        else:
-            data = vbt.BinanceData.pull(
-                symbols,
-                start=self.start_date,
-                end=self.end_date,
-                timeframe=tf
-            )
-
-            if not os.path.exists('data_pro'):
-                os.makedirs('data_pro')
-
-            data.to_hdf(filename)
-
-        return data
\ No newline at end of file
+        os.makedirs(self.path, exist_ok=True)
+        start = pd.Timestamp(self.start_date, tz="UTC")
+        # A range ending in the future is only covered up to now
+        end = min(pd.Timestamp(self.end_date, tz="UTC"), pd.Timestamp.now(tz="UTC"))
+
+        store_index = self._load_store_index()
+        frames = {}
+        to_pull = {}
+        for symbol in symbols:
+            key = f"{symbol}_{tf}"
+            covered = store_index.get(key)
+            if covered is not None:
+                frames[symbol] = pd.read_hdf(self._symbol_file(symbol, tf), key="data")
+            for date_range in self._missing_ranges(covered, start, end):
+                to_pull.setdefault(date_range, []).append(symbol)
+
+        # One pull per missing date range, for every symbol missing it
+        pulled_ranges = {}
+        for (range_start, range_end), range_symbols in to_pull.items():
+            print(f"Pulling {range_symbols} {tf} from {range_start} to {range_end}")
+            pulled = vbt.BinanceData.pull(range_symbols, start=range_start, end=range_end, timeframe=tf)
+            for symbol in range_symbols:
+                new = pulled.data.get(symbol)
+                if new is None or new.empty:
+                    # Failed or skipped: the range is not marked as covered and is pulled again next time
+                    continue
+                df = new if symbol not in frames else pd.concat([frames[symbol], new])
+                # The freshest pull wins for candles fetched twice (e.g. the one in progress)
+                frames[symbol] = df[~df.index.duplicated(keep="last")].sort_index()
+                pulled_ranges.setdefault(symbol, []).append((range_start, range_end))
+
+        # Only the ranges this pull returned extend the stored coverage
+        for symbol, ranges in pulled_ranges.items():
+            key = f"{symbol}_{tf}"
+            for range_start, range_end in ranges:
+                covered = store_index.get(key, {"start": range_start.isoformat(), "end": range_end.isoformat()})
+                store_index[key] = {
+                    "start": min(pd.Timestamp(covered["start"]), range_start).isoformat(),
+                    "end": max(pd.Timestamp(covered["end"]), range_end).isoformat(),
+                }
+            frames[symbol].to_hdf(self._symbol_file(symbol, tf), key="data", mode="w")
+        self._write_json(self._store_index_file(), store_index)
+
+        # Same range as a direct pull: end excluded
+        end = pd.Timestamp(self.end_date, tz="UTC")
+        return vbt.BinanceData.from_data({
+            symbol: frames[symbol][(frames[symbol].index >= start) & (frames[symbol].index < end)]
+            for symbol in symbols if symbol in frames
+        })
@@ -95,6 +95,18 @@ leverage = 1
 start_date = "2020-01-01"
 end_date = "2024-12-08"
 strategy_type = ["long"]
+# "pandas" (reference iterrows loop), "numpy" (array event loop) or "batch" (whole grid per pair/timeframe).
+# "numpy" and "batch" are much faster, but on multi-combination runs they may order same-bar trades
+# differently from "pandas", so their results can differ: opt in explicitly
+backtest_engine = "pandas"
+executor = "thread"  # "thread" or "process" (process pool, OHLCV shared through shared memory)
+snapshot_dir = None  # "batch" engine only: directory where each pair/timeframe run is saved and resumed on new candles
+# Stop simulating hopeless configs ("numpy" and "batch" engines), e.g.
+# {"max_drawdown": 80, "min_wallet": 200, "min_trades": 5, "min_trades_date": "2021-01-01"}
+pruning = None
+# Successive-halving search instead of the exhaustive grid (batch engine), e.g.
+# {"metric": "sharpe_ratio", "keep": 0.5, "windows": [0.25, 0.5, 1]}
+optimizer = None
 
 if True:
     trix_lengths = create_range_list(5, 60, 5)
@@ -1,12 +1,23 @@
 import asyncio
+import copy
 import itertools
-from concurrent.futures import ThreadPoolExecutor
+import math
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import multiprocessing
 from utilities.data_manager import ExchangeDataManager
 from utilities.custom_indicators import Trix
 from utilities.bt_analysis import get_metrics
+from utilities.cache import fingerprint, indicator_cache
+from utilities.shared_data import SharedFrame
+from utilities.ma_matrix import ema_matrix, trix_grid
+from utilities.optimizer import SuccessiveHalving
+from utilities.bt_engine import BatchState, PruningRules, SignalMatrix, align_column, run_array_backtest, run_batch_backtest
+from utilities.streaming import LongMaState, TrixState
 from utilities.plot_analysis import plot_equity_vs_asset, plot_bar_by_month
 import ta
+import numpy as np
 import pandas as pd
 import platform
 from utilities.my_utils import save_dataframe_with_unique_filename, extract_symbols_from_files, remove_performed_symbols
@@ -17,6 +28,12 @@ import input_data
 
 import time
 
+DESIRED_COLUMNS = [
+    'pair', 'timeframe', 'param_set', 'wallet', 'sharpe_ratio',
+    'win_rate', 'avg_profit', 'total_trades', 'max_drawdown', 'status', 'pruned_rule', 'pruned_date',
+    'trix_length', 'trix_signal_length', 'trix_signal_type', 'long_ma_length', 'size'
+]
+
 # Set the correct event loop policy for Windows
 if platform.system() == "Windows":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
@@ -34,6 +51,10 @@ class DataLoader:
         """Load historical data."""
         return self.exchange.load_data(pair, timeframe)
 
+    def load_tensor(self, pairs, timeframe):
+        """Load several pairs of one timeframe as a (time x pair x field) AlignedTensor."""
+        return self.exchange.load_tensor(pairs, timeframe)
+
 
 class Strategy:
     def __init__(self, df_list, oldest_pair, strategy_type, params):
@@ -42,6 +63,7 @@ class Strategy:
         self.use_long = "long" in strategy_type
         self.use_short = "short" in strategy_type
         self.params = params
+        self.signals = None
 
     def populate_indicators(self):
         for comb, df in self.df_list.items():
@@ -54,16 +76,31 @@ class Strategy:
                 trix_length=params["trix_length"],
                 trix_signal_length=params["trix_signal_length"],
                 trix_signal_type=params["trix_signal_type"],
+                cache=indicator_cache,
+                pair=comb,
             )
             df["trix"] = trix_obj.get_trix_pct_line()
             df["trix_signal"] = trix_obj.get_trix_signal_line()
             df["trix_hist"] = df["trix"] - df["trix_signal"]
-            df["long_ma"] = ta.trend.ema_indicator(df["close"], window=params["long_ma_length"])
+            df["long_ma"] = indicator_cache.indicator(
+                "long_ma", (params["long_ma_length"],),
+                lambda: ta.trend.ema_indicator(df["close"], window=params["long_ma_length"]),
+                trix_obj.data_key, pair=comb
+            )
             self.df_list[comb] = df
 
         return self.df_list[self.oldest_pair]
 
-    def populate_buy_sell(self):
+    def populate_buy_sell(self, signal_mode="dict"):
+        if signal_mode == "matrix":
+            # One aligned (bars x combs) boolean matrix per signal kind, read by bar position
+            self.signals = SignalMatrix.from_frames(
+                self.df_list, self.df_list[self.oldest_pair].index, self.use_long, self.use_short
+            )
+            return self.df_list[self.oldest_pair]
+        elif signal_mode != "dict":
+            raise ValueError(f"Unknown signal mode '{signal_mode}'. Choose 'dict' or 'matrix'.")
+
         full_list = []
         for comb, df in self.df_list.items():
             df["comb"] = comb
@@ -104,7 +141,8 @@ class Strategy:
         )
         return self.df_list[self.oldest_pair]
 
-    def run_backtest(self, initial_wallet=1000, leverage=1, start_date=None, end_date=None):
+    def run_backtest(self, initial_wallet=1000, leverage=1, start_date=None, end_date=None, engine="pandas",
+                     pruning=None):
         # Filter the DataFrame based on the date range, handling None cases
         if start_date is not None:
             self.df_list = {
@@ -128,6 +166,16 @@ class Strategy:
         previous_day = 0
         current_positions = {}
 
+        if engine == "numpy":
+            wallet, trades, days, pruned = self._run_array_loop(df_ini, initial_wallet, leverage, taker_fee, pruning)
+            return self._format_results(wallet, trades, days, pruned)
+        elif engine != "pandas":
+            raise ValueError(f"Unknown backtest engine '{engine}'. Choose 'pandas' or 'numpy'.")
+        elif pruning is not None:
+            raise ValueError("Pruning is only supported by the numpy engine")
+        elif not hasattr(self, "open_long_obj"):
+            raise ValueError("The pandas engine needs populate_buy_sell(signal_mode='dict')")
+
         for index, ini_row in df_ini.iterrows():
             # -- Add daily report --
             current_day = index.day
@@ -282,6 +330,41 @@ class Strategy:
                     }
                     short_exposition += 0
 
+        return self._format_results(wallet, trades, days)
+
+    def _run_array_loop(self, df_ini, initial_wallet, leverage, taker_fee, pruning=None):
+        # Convert every comb to contiguous (bars x combs) arrays once, then loop on bar positions
+        index = df_ini.index
+        if self.signals is not None:
+            signals = self.signals.take(index)
+        else:
+            signals = SignalMatrix.from_frames(self.df_list, index, self.use_long, self.use_short)
+
+        return run_array_backtest(
+            dates=index,
+            ref_open=df_ini["open"].to_numpy(dtype=np.float64),
+            opens=align_column(self.df_list, index, "open"),
+            closes=align_column(self.df_list, index, "close"),
+            open_long=signals.open_long,
+            close_long=signals.close_long,
+            open_short=signals.open_short,
+            close_short=signals.close_short,
+            combs=signals.combs,
+            sizes=[self.params[comb]["size"] for comb in signals.combs],
+            initial_wallet=initial_wallet,
+            leverage=leverage,
+            taker_fee=taker_fee,
+            pruning=pruning,
+        )
+
+    @staticmethod
+    def _format_results(wallet, trades, days, pruned=None):
+        # pruned: (rule, date) when the run was stopped early by a PruningRules rule
+        status = {
+            "status": "pruned" if pruned else "completed",
+            "pruned_rule": pruned[0] if pruned else None,
+            "pruned_date": pruned[1] if pruned else None,
+        }
         if len(trades) == 0:
             # raise ValueError("No trades have been made")
             return {
@@ -293,7 +376,7 @@ class Strategy:
                 "wallet": 0,
                 "trades": pd.DataFrame,
                 "days": pd.DataFrame,
-            }
+            } | status
 
         df_days = pd.DataFrame(days)
         df_days["day"] = pd.to_datetime(df_days["day"])
@@ -307,7 +390,188 @@ class Strategy:
             "wallet": wallet,
             "trades": df_trades,
             "days": df_days,
+        } | status
+
+
+class BatchStrategy:
+    """Trix strategy evaluated for a whole list of param dicts on one pair/timeframe at once."""
+
+    def __init__(self, df, strategy_type, params_list, pair=None, timeframe=None):
+        self.df = df
+        self.pair = pair
+        self.timeframe = timeframe
+        self.strategy_type = strategy_type
+        self.use_long = "long" in strategy_type
+        self.use_short = "short" in strategy_type
+        self.params_list = params_list
+        # Engine state, and the snapshot this strategy resumes from (see from_snapshot)
+        self.state = None
+        self.snapshot = None
+        # Pruning rules the state was simulated with, saved in the snapshot
+        self.pruning = None
+        # (date, trix states, long MA states) once the indicator states are known at some bar
+        self._indicator_states = None
+
+    @classmethod
+    def from_snapshot(cls, file_name, df):
+        """
+        Strategy resuming the run saved by save_snapshot: only the bars of df after the last
+        simulated one are processed, starting from the saved wallets, positions and indicators.
+
+        :param file_name: file written by save_snapshot
+        :param df: OHLCV of the pair, with the history up to the snapshot for snapshot_mismatch to check it
+        """
+        with open(file_name, "rb") as f:
+            snapshot = pickle.load(f)
+        strategy = cls(df, snapshot["strategy_type"], snapshot["params_list"], snapshot["pair"], snapshot["timeframe"])
+        strategy.snapshot = snapshot
+        strategy.state = snapshot["state"]
+        return strategy
+
+    def _history_key(self, last_date):
+        # Prices the indicators and the engine read, up to the last simulated bar
+        return fingerprint(self.df.loc[:last_date, ["open", "close"]])
+
+    def snapshot_mismatch(self, params_list, pruning):
+        """
+        Why the snapshot this strategy resumes from cannot be continued with params_list,
+        pruning and the current history, None when it can.
+        """
+        if self.params_list != params_list:
+            return "was made for another grid"
+        if self.snapshot.get("pruning") != pruning:
+            return "was made with other pruning rules"
+        if self.snapshot.get("history_key") != self._history_key(self.snapshot["last_date"]):
+            return "was made on another history"
+        return None
+
+    def _distinct_keys(self):
+        trix_keys = [(p["trix_length"], p["trix_signal_length"], p["trix_signal_type"]) for p in self.params_list]
+        ma_keys = [p["long_ma_length"] for p in self.params_list]
+        return trix_keys, ma_keys, list(dict.fromkeys(trix_keys)), list(dict.fromkeys(ma_keys))
+
+    def populate_indicators(self):
+        # Each distinct indicator setting is computed once and shared by every config using it
+        trix_keys, ma_keys, distinct_trix, distinct_ma = self._distinct_keys()
+        self.hist_cols = np.array([distinct_trix.index(key) for key in trix_keys])
+        self.ma_cols = np.array([distinct_ma.index(key) for key in ma_keys])
+        if self.snapshot is not None:
+            self._populate_new_bars(distinct_trix, distinct_ma)
+            return
+
+        # Every window of an axis is computed in one matrix call (see utilities/ma_matrix.py). The
+        # matrices are not memoized in indicator_cache: they are large, one per pair/timeframe, and
+        # never reused by another pair
+        close = self.df["close"]
+        self.trix_hist = self._trix_hist_matrix(close, distinct_trix)
+        self.long_ma = ema_matrix(close.to_numpy(), distinct_ma)
+
+    def _populate_new_bars(self, distinct_trix, distinct_ma):
+        # Resumed run: only the new bars, the indicators advancing from their saved states
+        last_date = self.snapshot["last_date"]
+        self.df = self.df[self.df.index > last_date]
+        trix_states = copy.deepcopy(self.snapshot["trix_states"])
+        ma_states = copy.deepcopy(self.snapshot["ma_states"])
+        close = self.df["close"].to_numpy(dtype=np.float64)
+        self.trix_hist = np.column_stack([trix_states[key].warm_up(close) for key in distinct_trix])
+        self.long_ma = np.column_stack([ma_states[length].warm_up(close) for length in distinct_ma])
+        self._indicator_states = (self.df.index[-1] if len(self.df) else last_date, trix_states, ma_states)
+
+    def _indicator_states_at(self, date):
+        """Trix and long MA states after the bar at date."""
+        if self._indicator_states is not None and self._indicator_states[0] == date:
+            return self._indicator_states[1:]
+        _, _, distinct_trix, distinct_ma = self._distinct_keys()
+        if self.snapshot is None:
+            trix_states = {key: TrixState(*key) for key in distinct_trix}
+            ma_states = {length: LongMaState(length) for length in distinct_ma}
+        else:
+            trix_states = copy.deepcopy(self.snapshot["trix_states"])
+            ma_states = copy.deepcopy(self.snapshot["ma_states"])
+        # self.df only holds the bars after the snapshot when resuming
+        close = self.df["close"][self.df.index <= date].to_numpy(dtype=np.float64)
+        for state in [*trix_states.values(), *ma_states.values()]:
+            state.warm_up(close)
+        self._indicator_states = (date, trix_states, ma_states)
+        return trix_states, ma_states
+
+    def save_snapshot(self, file_name):
+        """
+        Save the engine state (wallets, open positions, trade counters, daily wallets) and the
+        indicator states at the last simulated bar, for from_snapshot to resume from.
+
+        :param file_name: pickle file, written atomically
+        """
+        if self.state is None or self.state.last_date is None:
+            raise ValueError("No bar was simulated, nothing to snapshot")
+        trix_states, ma_states = self._indicator_states_at(self.state.last_date)
+        snapshot = {
+            "strategy_type": self.strategy_type,
+            "params_list": self.params_list,
+            "pair": self.pair,
+            "timeframe": self.timeframe,
+            "last_date": self.state.last_date,
+            "history_key": self._history_key(self.state.last_date),
+            "pruning": self.pruning,
+            "state": self.state,
+            "trix_states": trix_states,
+            "ma_states": ma_states,
         }
+        os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+        tmp_file = file_name + ".tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, file_name)
+
+    @staticmethod
+    def _trix_hist_matrix(close, distinct_trix):
+        """(bars x distinct trix) histogram, one trix_grid per signal type."""
+        trix_hist = np.empty((len(close), len(distinct_trix)))
+        for signal_type in dict.fromkeys(key[2] for key in distinct_trix):
+            columns = [i for i, key in enumerate(distinct_trix) if key[2] == signal_type]
+            trix_lengths = list(dict.fromkeys(distinct_trix[i][0] for i in columns))
+            signal_lengths = list(dict.fromkeys(distinct_trix[i][1] for i in columns))
+            grid = trix_grid(close.to_numpy(), trix_lengths, signal_lengths, signal_type)
+            for i in columns:
+                trix_length, trix_signal_length, _ = distinct_trix[i]
+                trix_hist[:, i] = grid[:, trix_lengths.index(trix_length), signal_lengths.index(trix_signal_length)]
+        return trix_hist
+
+    def run_backtest(self, initial_wallet=1000, leverage=1, start_date=None, end_date=None, pruning=None):
+        # The state is kept (and resumed from a snapshot) so that later runs can continue it
+        if self.state is None:
+            self.state = BatchState(len(self.params_list), initial_wallet)
+        self.pruning = pruning
+        mask = np.ones(len(self.df), dtype=bool)
+        if start_date is not None:
+            mask &= self.df.index >= start_date
+        if end_date is not None:
+            mask &= self.df.index <= end_date
+
+        metrics = run_batch_backtest(
+            dates=self.df.index[mask],
+            opens=self.df["open"].to_numpy(dtype=np.float64)[mask],
+            closes=self.df["close"].to_numpy(dtype=np.float64)[mask],
+            trix_hist=self.trix_hist[mask],
+            long_ma=self.long_ma[mask],
+            hist_cols=self.hist_cols,
+            ma_cols=self.ma_cols,
+            sizes=[p["size"] for p in self.params_list],
+            use_long=self.use_long,
+            use_short=self.use_short,
+            initial_wallet=initial_wallet,
+            leverage=leverage,
+            state=self.state,
+            pruning=pruning,
+        )
+        # Kept as objects so that unpruned configs get None, as with the numpy engine, not NaT
+        metrics["pruned_date"] = pd.Series(metrics["pruned_date"], dtype=object)
+        return pd.concat([pd.DataFrame(self.params_list), pd.DataFrame(metrics)], axis=1)
+
+
+def get_pruning_rules():
+    """PruningRules built from input_data.pruning, None when pruning is disabled."""
+    return PruningRules(**input_data.pruning) if input_data.pruning else None
 
 
 def process_combination(combo, data_loader, nb_comb, current_index):
@@ -318,13 +582,19 @@ def process_combination(combo, data_loader, nb_comb, current_index):
     df = data_loader.load_data(pair, tf)
     df["pair"] = pair
     df["tf"] = tf
+
+    return backtest_combination(tf, pair, params, df)
+
+
+def backtest_combination(tf, pair, params, df):
     df_list = {f"{tf}-{pair}": df}
 
     # Initialize strategy and run backtest
     strategy = Strategy(df_list, f"{tf}-{pair}", ["long"], {f"{tf}-{pair}": params})
     strategy.populate_indicators()
-    strategy.populate_buy_sell()
-    dct_result = strategy.run_backtest(initial_wallet=1000, leverage=1, start_date="2020-01-01", end_date=None)
+    strategy.populate_buy_sell(signal_mode="matrix" if input_data.backtest_engine == "numpy" else "dict")
+    dct_result = strategy.run_backtest(initial_wallet=1000, leverage=1, start_date="2020-01-01", end_date=None,
+                                       engine=input_data.backtest_engine, pruning=get_pruning_rules())
 
     # Filter and return result
     exclude_fields = {'trades', 'days'}
@@ -340,6 +610,126 @@ def process_combination(combo, data_loader, nb_comb, current_index):
     return pd.DataFrame([combined_data])
 
 
+# -- Process pool: OHLCV is published once in shared memory and attached by every worker --
+_worker_frames = {}
+_worker_data = {}
+
+
+def _init_worker(shared_frames):
+    global _worker_frames
+    _worker_frames = shared_frames
+
+
+def _worker_load(tf, pair):
+    if (tf, pair) not in _worker_data:
+        _worker_data[(tf, pair)] = _worker_frames[(tf, pair)].attach()
+    # Shallow copy: the strategy adds its indicator columns without touching the shared block
+    return _worker_data[(tf, pair)].copy(deep=False)
+
+
+def process_combination_chunk(chunk):
+    tf, pair, _ = chunk[0]
+    print(f"Processing {len(chunk)} combinations of {pair} {tf}...")
+    return pd.concat(
+        [backtest_combination(tf, pair, params, _worker_load(tf, pair)) for tf, pair, params in chunk],
+        ignore_index=True,
+    )
+
+
+def run_process_pool(combinations, data_loader, num_workers, chunks_per_worker=4):
+    """
+    Backtest combinations on a process pool, OHLCV of each pair/timeframe being shared zero-copy.
+
+    :param combinations: list of (tf, pair, params)
+    :param data_loader: DataLoader used to load each pair/timeframe once
+    :param num_workers: number of worker processes
+    :param chunks_per_worker: combinations are sent in about num_workers * chunks_per_worker chunks
+    """
+    shared_frames = {}
+    try:
+        for tf, pair in dict.fromkeys((tf, pair) for tf, pair, _ in combinations):
+            shared_frames[(tf, pair)] = SharedFrame.publish(data_loader.load_data(pair, tf))
+
+        chunk_size = max(1, math.ceil(len(combinations) / (num_workers * chunks_per_worker)))
+        chunks = [combinations[i:i + chunk_size] for i in range(0, len(combinations), chunk_size)]
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker, initargs=(shared_frames,)) as executor:
+            df_results = pd.concat(list(executor.map(process_combination_chunk, chunks)), ignore_index=True)
+    finally:
+        for shared in shared_frames.values():
+            shared.close()
+
+    return df_results
+
+
+def get_snapshot_file(snapshot_dir, pair, tf):
+    return os.path.join(snapshot_dir, f"{pair.replace('/', '')}_{tf}.pkl")
+
+
+def process_pair_batch(tf, pair, params_list, data_loader, snapshot_dir=None):
+    print(f"Processing {len(params_list)} combinations of {pair} {tf} in one batch...")
+
+    # Load data once for the whole grid
+    df = data_loader.load_data(pair, tf)
+
+    # With a snapshot of the same grid, rules and history, only the candles added since the last run are simulated
+    snapshot_file = get_snapshot_file(snapshot_dir, pair, tf) if snapshot_dir else None
+    pruning = get_pruning_rules()
+    strategy = None
+    if snapshot_file and os.path.exists(snapshot_file):
+        strategy = BatchStrategy.from_snapshot(snapshot_file, df)
+        mismatch = strategy.snapshot_mismatch(params_list, pruning)
+        if mismatch:
+            print(f"Snapshot of {pair} {tf} {mismatch}, running from scratch")
+            strategy = None
+    if strategy is None:
+        strategy = BatchStrategy(df, ["long"], params_list, pair=pair, timeframe=tf)
+    strategy.populate_indicators()
+    df_results = strategy.run_backtest(
+        initial_wallet=1000, leverage=1, start_date="2020-01-01", end_date=None, pruning=pruning
+    )
+    if snapshot_file:
+        strategy.save_snapshot(snapshot_file)
+    df_results["timeframe"] = tf
+    df_results["param_set"] = "p1"
+    df_results["pair"] = pair
+
+    return df_results[DESIRED_COLUMNS]
+
+
+def optimize_pair_batch(tf, pair, grid, data_loader, settings):
+    """
+    Successive-halving search of grid on one pair/timeframe, each rung run by the batch engine.
+
+    :param grid: parameter name -> values, as in input_data
+    :param settings: SuccessiveHalving keyword arguments (metric, keep, windows, min_keep)
+    """
+    print(f"Optimizing {pair} {tf} by successive halving...")
+    df = data_loader.load_data(pair, tf)
+    period = df.index[df.index >= "2020-01-01"]
+    if len(period) == 0:
+        print(f"No {pair} {tf} candle after 2020-01-01, skipped")
+        return pd.DataFrame(columns=DESIRED_COLUMNS)
+    first_bar, last_bar = period[0], period[-1]
+
+    def evaluate(params_list, window):
+        # Indicators are computed on the whole history, only the simulated bars are shortened
+        strategy = BatchStrategy(df, ["long"], params_list, pair=pair, timeframe=tf)
+        strategy.populate_indicators()
+        return strategy.run_backtest(
+            initial_wallet=1000, leverage=1, start_date=last_bar - (last_bar - first_bar) * window, end_date=None,
+            pruning=get_pruning_rules()
+        )
+
+    optimizer = SuccessiveHalving(grid, evaluate, **settings)
+    df_results = optimizer.run()
+    print(optimizer.report())
+    df_results["timeframe"] = tf
+    df_results["param_set"] = "p1"
+    df_results["pair"] = pair
+
+    return df_results[DESIRED_COLUMNS]
+
+
 async def main():
     # Start the timer
     start_time = time.time()
@@ -392,20 +782,40 @@ async def main():
         # Multithreading
         num_cores = multiprocessing.cpu_count()
         print('num_cores', num_cores)
-        with ThreadPoolExecutor(max_workers=num_cores) as executor:
-            futures = []
-            for i, combo in enumerate(symbol_params_combinations, start=1):
-                futures.append(executor.submit(process_combination, combo, data_loader, nb_comb, i))
+        if input_data.optimizer:
+            # Coarse-to-fine search instead of the exhaustive grid, rungs run by the batch engine
+            grid = {
+                "trix_length": trix_lengths, "trix_signal_length": trix_signal_lengths,
+                "trix_signal_type": trix_signal_types, "long_ma_length": long_ma_lengths, "size": trix_size,
+            }
+            df_results = pd.concat(
+                [optimize_pair_batch(tf, symbol, grid, data_loader, input_data.optimizer) for tf in intervals],
+                ignore_index=True,
+            )
+        elif input_data.backtest_engine == "batch":
+            # One batch per timeframe: the whole grid is simulated in a single pass over the bars
+            params_by_tf = defaultdict(list)
+            for tf, _, params in symbol_params_combinations:
+                params_by_tf[tf].append(params)
+            df_results = pd.concat(
+                [
+                    process_pair_batch(tf, symbol, params_list, data_loader, input_data.snapshot_dir)
+                    for tf, params_list in params_by_tf.items()
+                ],
+                ignore_index=True,
+            )
+        elif input_data.executor == "process":
+            df_results = run_process_pool(symbol_params_combinations, data_loader, num_cores)
+        else:
+            with ThreadPoolExecutor(max_workers=num_cores) as executor:
+                futures = []
+                for i, combo in enumerate(symbol_params_combinations, start=1):
+                    futures.append(executor.submit(process_combination, combo, data_loader, nb_comb, i))
 
-            df_results = pd.concat([future.result() for future in futures], ignore_index=True)
+                df_results = pd.concat([future.result() for future in futures], ignore_index=True)
 
         # Save results
-        desired_columns = [
-            'pair', 'timeframe', 'param_set', 'wallet', 'sharpe_ratio',
-            'win_rate', 'avg_profit', 'total_trades', 'max_drawdown',
-            'trix_length', 'trix_signal_length', 'trix_signal_type', 'long_ma_length', 'size'
-        ]
-        df_results = df_results[desired_columns]
+        df_results = df_results[DESIRED_COLUMNS]
         modified_symbol = symbol.replace("/", "")
         if input_data.COLAB:
             dir_colab = '/content/drive/My Drive/Colab Notebooks/param_optimization/'
@@ -4,10 +4,12 @@ from vbt_strategy_trix import Strategy
 from vectorbtpro import *
 import itertools
 from collections import defaultdict
+from utilities.shared_data import SharedFrame
 from utilities.my_utils import save_dataframe_with_unique_filename, extract_symbols_from_files, remove_performed_symbols
 import input_data
 import time
-from concurrent.futures import ThreadPoolExecutor
+import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import multiprocessing
 import counter
 
@@ -20,6 +22,10 @@ def process_combination(combo, vbt_data, counter, tf):
 
     symbols = list(vbt_data.columns)
 
+    return backtest_combination(params, vbt_data, symbols, tf)
+
+
+def backtest_combination(params, vbt_data, symbols, tf):
     strategy = Strategy(symbols, tf, vbt_data, ["long"], params)
     strategy.populate_indicators()
     strategy.populate_buy_sell()
@@ -27,6 +33,52 @@ def process_combination(combo, vbt_data, counter, tf):
 
     return pd.DataFrame(combined_data)
 
+
+# -- Process pool: Close prices are published once in shared memory and attached by every worker --
+_worker_close = None
+_worker_data = None
+
+
+def _init_worker(shared_close):
+    global _worker_close
+    _worker_close = shared_close
+
+
+def process_combination_chunk(chunk):
+    global _worker_data
+    if _worker_data is None:
+        close = _worker_close.attach()
+        _worker_data = vbt.Data.from_data(
+            {symbol: close[[symbol]].rename(columns={symbol: "Close"}) for symbol in close.columns}
+        )
+    tf = chunk[0][0]
+    print(f"Processing {len(chunk)} {tf} combinations...")
+    return pd.concat(
+        [backtest_combination(params, _worker_data, _worker_close.columns, tf) for _, _, params in chunk],
+        ignore_index=True,
+    )
+
+
+def run_process_pool(combinations, vbt_data, num_workers, chunks_per_worker=4):
+    """
+    Backtest combinations on a process pool, the Close prices of vbt_data being shared zero-copy.
+
+    :param combinations: list of (tf, symbols, params) of a single timeframe
+    :param vbt_data: vbt data holding the Close prices of every symbol
+    :param num_workers: number of worker processes
+    :param chunks_per_worker: combinations are sent in about num_workers * chunks_per_worker chunks
+    """
+    shared_close = SharedFrame.publish(vbt_data.get("Close"))
+    try:
+        chunk_size = max(1, math.ceil(len(combinations) / (num_workers * chunks_per_worker)))
+        chunks = [combinations[i:i + chunk_size] for i in range(0, len(combinations), chunk_size)]
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker, initargs=(shared_close,)) as executor:
+            df_results = pd.concat(list(executor.map(process_combination_chunk, chunks)), ignore_index=True)
+    finally:
+        shared_close.close()
+
+    return df_results
+
 if __name__ == '__main__':
     run_start_time = time.time()
 
@@ -81,7 +133,9 @@ if __name__ == '__main__':
         print('num_cores', num_cores)
 
         multithread = True
-        if multithread:
+        if input_data.executor == "process":
+            df_results = run_process_pool(symbol_params_combinations, vbt_data, num_cores)
+        elif multithread:
             with ThreadPoolExecutor(max_workers=num_cores) as executor:
                 futures = []
                 for i, combo in enumerate(symbol_params_combinations, start=1):
@@ -0,0 +1,568 @@
+import numpy as np
+import pandas as pd
+
+
+def align_column(df_list, index, column):
+    """
+    Stack one column of every comb frame into a (bars x combs) float array aligned on index.
+
+    Parameters:
+        df_list (dict): comb name -> DataFrame, as held by Strategy.df_list.
+        index (pd.DatetimeIndex): Reference bars (the oldest pair's index).
+        column (str): Column to extract.
+
+    Returns:
+        np.ndarray: C-contiguous float64 array, NaN where a comb has no bar.
+    """
+    columns = []
+    for df in df_list.values():
+        serie = df[column] if df.index.equals(index) else df[column].reindex(index)
+        columns.append(serie.to_numpy(dtype=np.float64))
+    return np.ascontiguousarray(np.column_stack(columns))
+
+
+class SignalMatrix:
+    """
+    Trix entry/exit signals kept as aligned (bars x combs) boolean matrices.
+
+    Replaces the date -> [comb] dicts built by Strategy.populate_buy_sell: each
+    signal kind is one matrix whose rows follow index and columns follow combs,
+    so the backtest loop reads signals by bar position.
+    """
+
+    def __init__(self, index, combs, open_long, close_long, open_short, close_short):
+        self.index = index
+        self.combs = combs
+        self.open_long = open_long
+        self.close_long = close_long
+        self.open_short = open_short
+        self.close_short = close_short
+
+    @classmethod
+    def from_frames(cls, df_list, index, use_long=True, use_short=False):
+        """
+        Build the matrices from the trix_hist/close/long_ma columns of every comb frame.
+
+        Parameters:
+            df_list (dict): comb name -> DataFrame with close, trix_hist and long_ma.
+            index (pd.DatetimeIndex): Reference bars.
+            use_long (bool): Build the LONG signals (all False otherwise).
+            use_short (bool): Build the SHORT signals (all False otherwise).
+        """
+        closes = align_column(df_list, index, "close")
+        trix_hist = align_column(df_list, index, "trix_hist")
+        long_ma = align_column(df_list, index, "long_ma")
+        no_signal = np.zeros(closes.shape, dtype=bool)
+
+        return cls(
+            index=index,
+            combs=list(df_list),
+            open_long=(trix_hist > 0) & (closes > long_ma) if use_long else no_signal,
+            close_long=trix_hist < 0 if use_long else no_signal,
+            open_short=(trix_hist < 0) & (closes < long_ma) if use_short else no_signal,
+            close_short=trix_hist > 0 if use_short else no_signal,
+        )
+
+    def take(self, index):
+        """Return the signals restricted to the bars of index (a subset of self.index)."""
+        if self.index.equals(index):
+            return self
+        rows = self.index.get_indexer(index)
+        if (rows < 0).any():
+            raise KeyError("Some bars are missing from the signal matrix index")
+        return SignalMatrix(
+            index=index,
+            combs=self.combs,
+            open_long=self.open_long[rows],
+            close_long=self.close_long[rows],
+            open_short=self.open_short[rows],
+            close_short=self.close_short[rows],
+        )
+
+
+def _rising(signal):
+    """Bars where a (bars x combs) boolean signal turns on, the first bar counting as a rise."""
+    rising = signal.copy()
+    rising[1:] &= ~signal[:-1]
+    return rising
+
+
+def _event_bars(open_long, close_long, open_short, close_short):
+    """
+    Bars on which a position can be opened or closed.
+
+    With level signals such as the Trix ones, a side cannot open on a bar that
+    closes it and an open LONG always closes a SHORT (and vice versa). A flat comb
+    then opens on the first bar of a signal run (or on a bar where it just closed),
+    and a held position closes on the first bar of its close run, so only the rising
+    edges need to be visited. Otherwise fall back to every bar carrying a signal.
+    """
+    level_signals = not (open_long & close_long).any() and not (open_short & close_short).any()
+    if open_short.any() and open_long.any():
+        level_signals &= not (open_long & ~close_short).any() and not (open_short & ~close_long).any()
+    if not level_signals:
+        return (open_long | close_long | open_short | close_short).any(axis=1)
+
+    return (
+        _rising(open_long)
+        | _rising(close_long)
+        | _rising(open_short)
+        | _rising(close_short)
+    ).any(axis=1)
+
+
+class PruningRules:
+    """
+    Conditions under which a configuration is hopeless and stops being simulated.
+
+    Rules are checked on every daily report, against the wallet valued at the open of the
+    day (the one the drawdown metric is computed on). A rule set to None is not checked.
+
+    Parameters:
+        max_drawdown (float): Prune when the drawdown from the wallet high exceeds this
+            percentage (50 prunes a config that lost half of its best wallet).
+        min_wallet (float): Prune when the wallet falls below this value.
+        min_trades (int): Prune when fewer trades than this were closed by min_trades_date.
+        min_trades_date (str | pd.Timestamp): Date from which min_trades is checked.
+    """
+
+    RULES = ("max_drawdown", "min_wallet", "min_trades")
+
+    def __init__(self, max_drawdown=None, min_wallet=None, min_trades=None, min_trades_date=None):
+        if min_trades is not None and min_trades_date is None:
+            raise ValueError("min_trades needs a min_trades_date")
+        self.max_drawdown = max_drawdown
+        self.min_wallet = min_wallet
+        self.min_trades = min_trades
+        self.min_trades_date = pd.Timestamp(min_trades_date) if min_trades_date is not None else None
+
+    def __eq__(self, other):
+        return isinstance(other, PruningRules) and vars(self) == vars(other)
+
+    def check(self, day_wallet, wallet_ath, total_trades, date):
+        """
+        Index in RULES of the first rule broken at this daily report, -1 where none is.
+
+        Parameters:
+            day_wallet, wallet_ath, total_trades (np.ndarray): (configs,) wallet of the day,
+                highest daily wallet so far (this day included) and closed trades.
+            date (pd.Timestamp): Bar of the daily report.
+
+        Returns:
+            np.ndarray: (configs,) int8 rule indexes.
+        """
+        day_wallet = np.asarray(day_wallet, dtype=np.float64)
+        broken = np.full(day_wallet.shape, -1, dtype=np.int8)
+        checks = []
+        if self.max_drawdown is not None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                checks.append((wallet_ath - day_wallet) / wallet_ath * 100 > self.max_drawdown)
+        else:
+            checks.append(None)
+        checks.append(day_wallet < self.min_wallet if self.min_wallet is not None else None)
+        if self.min_trades is not None and date >= _localize(self.min_trades_date, date):
+            checks.append(np.asarray(total_trades) < self.min_trades)
+        else:
+            checks.append(None)
+
+        for rule, fired in enumerate(checks):
+            if fired is not None:
+                broken[(broken < 0) & fired] = rule
+        return broken
+
+
+def _localize(timestamp, like):
+    """timestamp in the time zone of like, so that both can be compared."""
+    if like.tzinfo is not None and timestamp.tzinfo is None:
+        return timestamp.tz_localize(like.tzinfo)
+    if like.tzinfo is None and timestamp.tzinfo is not None:
+        return timestamp.tz_convert(None)
+    return timestamp
+
+
+def run_array_backtest(
+    dates,
+    ref_open,
+    opens,
+    closes,
+    open_long,
+    close_long,
+    open_short,
+    close_short,
+    combs,
+    sizes,
+    initial_wallet=1000,
+    leverage=1,
+    taker_fee=0.0005,
+    pruning=None,
+):
+    """
+    Run the Strategy.run_backtest event loop over integer bar positions.
+
+    Same LONG/SHORT open/close/fee logic as the pandas loop, but prices and
+    signals are read from (bars x combs) arrays and only the bars where
+    something can happen (a new day or a signal edge) are visited.
+
+    Parameters:
+        dates (pd.DatetimeIndex): Reference bars.
+        ref_open (np.ndarray): Open of the reference pair, used for the daily report.
+        opens, closes (np.ndarray): (bars x combs) prices.
+        open_long, close_long, open_short, close_short (np.ndarray): (bars x combs) booleans.
+        combs (list): Comb names, in column order.
+        sizes (list): Position size of each comb, in column order.
+        initial_wallet (float): Starting wallet.
+        leverage (float): Leverage applied to the position size.
+        taker_fee (float): Fee applied on every open and close.
+        pruning (PruningRules): Stop at the first daily report breaking a rule. The wallet is
+            then the one of that report and the open positions are dropped.
+
+    Returns:
+        tuple: (wallet, trades, days, pruned) with trades/days as lists of dicts and pruned
+        None, or (rule name, date) when the run was stopped by pruning.
+    """
+    n_bars, n_combs = opens.shape
+
+    day = dates.day.to_numpy()
+    new_day = np.empty(n_bars, dtype=bool)
+    new_day[:1] = day[:1] != 0
+    new_day[1:] = day[1:] != day[:-1]
+    active = new_day | _event_bars(open_long, close_long, open_short, close_short)
+
+    years = dates.year.tolist()
+    months = dates.month.tolist()
+    days_of_month = day.tolist()
+    new_day_l = new_day.tolist()
+    ref_open_l = ref_open.tolist()
+    # One flat list per comb: opens_l[j][i] is comb j at bar i
+    opens_l = opens.T.tolist()
+    closes_l = closes.T.tolist()
+    open_long_l = open_long.T.tolist()
+    close_long_l = close_long.T.tolist()
+    open_short_l = open_short.T.tolist()
+    close_short_l = close_short.T.tolist()
+
+    wallet = initial_wallet
+    wallet_ath = -np.inf
+    trades = []
+    days = []
+    current_positions = {}
+
+    for i in np.flatnonzero(active).tolist():
+        # -- Add daily report --
+        if new_day_l[i]:
+            temp_wallet = wallet
+            for j, position in current_positions.items():
+                close_price = opens_l[j][i]
+                if position["side"] == "LONG":
+                    trade_result = (close_price - position["price"]) / position["price"]
+                else:
+                    trade_result = (position["price"] - close_price) / position["price"]
+                close_size = position["size"] + position["size"] * trade_result
+                fee = close_size * taker_fee
+                temp_wallet += close_size - position["size"] - fee
+
+            days.append(
+                {
+                    "day": str(years[i]) + "-" + str(months[i]) + "-" + str(days_of_month[i]),
+                    "wallet": temp_wallet,
+                    "price": ref_open_l[i],
+                    "long_exposition": 0,
+                    "short_exposition": 0,
+                    "risk": 0,
+                }
+            )
+            if pruning is not None:
+                wallet_ath = max(wallet_ath, temp_wallet)
+                rule = int(pruning.check(temp_wallet, wallet_ath, len(trades), dates[i]))
+                if rule >= 0:
+                    return temp_wallet, trades, days, (PruningRules.RULES[rule], dates[i])
+
+        # -- Close LONG then SHORT --
+        if current_positions:
+            for side, close_signal in (("LONG", close_long_l), ("SHORT", close_short_l)):
+                to_close = [j for j, p in current_positions.items() if p["side"] == side and close_signal[j][i]]
+                for j in to_close:
+                    position = current_positions.pop(j)
+                    close_price = closes_l[j][i]
+                    if side == "LONG":
+                        trade_result = (close_price - position["price"]) / position["price"]
+                    else:
+                        trade_result = (position["price"] - close_price) / position["price"]
+                    close_size = position["size"] + position["size"] * trade_result
+                    fee = close_size * taker_fee
+                    wallet += close_size - position["size"] - fee
+                    trades.append(
+                        {
+                            "pair": combs[j],
+                            "open_date": position["date"],
+                            "close_date": dates[i],
+                            "position": side,
+                            "open_reason": position["reason"],
+                            "close_reason": "Market",
+                            "open_price": position["price"],
+                            "close_price": close_price,
+                            "open_fee": position["fee"],
+                            "close_fee": fee,
+                            "open_trade_size": position["size"],
+                            "close_trade_size": close_size,
+                            "wallet": wallet,
+                        }
+                    )
+
+        # -- Open LONG then SHORT --
+        for side, open_signal in (("LONG", open_long_l), ("SHORT", open_short_l)):
+            for j in range(n_combs):
+                if open_signal[j][i] and j not in current_positions:
+                    open_price = closes_l[j][i]
+                    pos_size = sizes[j] * wallet * leverage
+                    fee = pos_size * taker_fee
+                    pos_size -= fee
+                    wallet -= fee
+                    current_positions[j] = {
+                        "size": pos_size,
+                        "date": dates[i],
+                        "price": open_price,
+                        "fee": fee,
+                        "reason": "Market",
+                        "side": side,
+                    }
+
+    return wallet, trades, days, None
+
+
+class BatchState:
+    """
+    Vectors of run_batch_backtest at the end of a run, to resume it on later bars.
+
+    Holds the position of every config (side, entry price, size, open fee), its wallet and
+    trade counters, the wallet of every daily report so far (NaN once a config is pruned),
+    the pruning status and the last processed bar. A run given a state starts from it and
+    leaves it at its own last bar, so simulating the bars in two runs sharing one state gives
+    the metrics of a single run over all of them.
+    """
+
+    def __init__(self, n_configs, initial_wallet=1000):
+        self.side = np.zeros(n_configs, dtype=np.int8)  # 1 LONG, -1 SHORT, 0 flat
+        self.entry_price = np.zeros(n_configs)
+        self.pos_size = np.zeros(n_configs)
+        self.open_fee = np.zeros(n_configs)
+        self.wallet = np.full(n_configs, float(initial_wallet))
+        self.total_trades = np.zeros(n_configs, dtype=np.int64)
+        self.good_trades = np.zeros(n_configs, dtype=np.int64)
+        self.sum_profit = np.zeros(n_configs)
+        self.day_wallets = np.empty((0, n_configs))
+        self.wallet_ath = np.full(n_configs, -np.inf)
+        self.pruned_rule = np.full(n_configs, -1, dtype=np.int8)  # index in PruningRules.RULES, -1 if not pruned
+        self.pruned_date = np.full(n_configs, None, dtype=object)
+        self.last_day = 0  # day of month of the last bar, 0 before the first run
+        self.last_date = None
+
+    @property
+    def n_configs(self):
+        return len(self.wallet)
+
+    def metrics(self):
+        """Metrics of everything simulated so far, as returned by run_batch_backtest."""
+        return _batch_metrics(
+            self.day_wallets, self.wallet, self.total_trades, self.good_trades, self.sum_profit,
+            self.pruned_rule, self.pruned_date,
+        )
+
+
+def run_batch_backtest(
+    dates,
+    opens,
+    closes,
+    trix_hist,
+    long_ma,
+    hist_cols,
+    ma_cols,
+    sizes,
+    use_long=True,
+    use_short=False,
+    initial_wallet=1000,
+    leverage=1,
+    taker_fee=0.0005,
+    state=None,
+    pruning=None,
+):
+    """
+    Simulate a whole grid of Trix configurations of one pair in a single pass over the bars.
+
+    Every config holds one position at most, exactly like Strategy.run_backtest on a
+    single comb, but position side, entry price, size and wallet are vectors over the
+    configs, so each bar costs a handful of array operations whatever the grid size.
+    Indicators are shared: config k reads trix_hist[:, hist_cols[k]] and
+    long_ma[:, ma_cols[k]].
+
+    Parameters:
+        dates (pd.DatetimeIndex): Bars to simulate.
+        opens, closes (np.ndarray): (bars,) prices.
+        trix_hist (np.ndarray): (bars x distinct trix settings) histogram.
+        long_ma (np.ndarray): (bars x distinct long MA lengths) moving averages.
+        hist_cols, ma_cols (np.ndarray): Column of each config in trix_hist / long_ma.
+        sizes (np.ndarray): Position size of each config.
+        use_long, use_short (bool): Sides to trade.
+        initial_wallet (float): Starting wallet.
+        leverage (float): Leverage applied to the position size.
+        taker_fee (float): Fee applied on every open and close.
+        state (BatchState): State of a previous run to resume from (initial_wallet is then
+            ignored), updated in place to the last bar of this run. A fresh state is used when None.
+        pruning (PruningRules): Configs breaking a rule on a daily report stop being simulated:
+            their wallet stays the one of that report and their open position is dropped.
+
+    Returns:
+        dict: metric name -> (configs,) array, with the keys of get_metrics plus "wallet",
+        "status" ("completed" or "pruned"), "pruned_rule" and "pruned_date", computed over
+        every bar simulated with this state (up to the pruning for pruned configs).
+    """
+    n_bars = len(dates)
+    n_configs = len(hist_cols)
+    hist_cols = np.asarray(hist_cols)
+    ma_cols = np.asarray(ma_cols)
+    sizes = np.asarray(sizes, dtype=np.float64)
+
+    if state is None:
+        state = BatchState(n_configs, initial_wallet)
+    elif state.n_configs != n_configs:
+        raise ValueError(f"The state holds {state.n_configs} configs, not {n_configs}")
+    elif state.last_date is not None and n_bars and dates[0] <= state.last_date:
+        raise ValueError(f"Bars up to {state.last_date} were already simulated with this state")
+
+    day = dates.day.to_numpy()
+    new_day = np.empty(n_bars, dtype=bool)
+    new_day[:1] = day[:1] != state.last_day
+    new_day[1:] = day[1:] != day[:-1]
+
+    # Working vectors are the state's own arrays, updated in place
+    side = state.side
+    entry_price = state.entry_price
+    pos_size = state.pos_size
+    open_fee = state.open_fee
+    wallet = state.wallet
+    total_trades = state.total_trades
+    good_trades = state.good_trades
+    sum_profit = state.sum_profit
+    day_wallets = []
+
+    # Only the configs still alive are read and updated on each bar
+    pruned = state.pruned_rule >= 0
+    live = np.flatnonzero(~pruned)
+    live_hist_cols = hist_cols[live]
+    live_ma_cols = ma_cols[live]
+
+    def _close(idx, price, direction):
+        if direction == 1:
+            trade_result = (price - entry_price[idx]) / entry_price[idx]
+        else:
+            trade_result = (entry_price[idx] - price) / entry_price[idx]
+        close_size = pos_size[idx] + pos_size[idx] * trade_result
+        fee = close_size * taker_fee
+        return idx, close_size, fee
+
+    for i in range(n_bars):
+        # -- Add daily report --
+        if new_day[i]:
+            temp_wallet = wallet.copy()
+            for direction in (1, -1):
+                idx, close_size, fee = _close(np.flatnonzero(side == direction), opens[i], direction)
+                temp_wallet[idx] += close_size - pos_size[idx] - fee
+            temp_wallet[pruned] = np.nan
+            np.fmax(state.wallet_ath, temp_wallet, out=state.wallet_ath)
+            day_wallets.append(temp_wallet)
+
+            if pruning is not None and len(live):
+                rules = pruning.check(temp_wallet[live], state.wallet_ath[live], total_trades[live], dates[i])
+                fired = rules >= 0
+                if fired.any():
+                    idx = live[fired]
+                    state.pruned_rule[idx] = rules[fired]
+                    state.pruned_date[idx] = dates[i]
+                    wallet[idx] = temp_wallet[idx]
+                    side[idx] = 0
+                    pruned[idx] = True
+                    live = live[~fired]
+                    live_hist_cols = hist_cols[live]
+                    live_ma_cols = ma_cols[live]
+                    if not len(live):
+                        # Every config is pruned: the remaining daily reports would all be NaN
+                        break
+
+        hist = trix_hist[i][live_hist_cols]
+        ma = long_ma[i][live_ma_cols]
+        price = closes[i]
+
+        # -- Close LONG / SHORT --
+        for direction, close_signal in ((1, hist < 0), (-1, hist > 0)):
+            if (direction == 1 and not use_long) or (direction == -1 and not use_short):
+                continue
+            mask = (side[live] == direction) & close_signal
+            if not mask.any():
+                continue
+            idx, close_size, fee = _close(live[mask], price, direction)
+            wallet[idx] += close_size - pos_size[idx] - fee
+            trade_result = close_size - pos_size[idx] - open_fee[idx] - fee
+            trade_result_pct = trade_result / pos_size[idx]
+            total_trades[idx] += 1
+            good_trades[idx] += trade_result_pct > 0
+            sum_profit[idx] += trade_result_pct
+            side[idx] = 0
+
+        # -- Open LONG / SHORT --
+        for direction, open_signal in ((1, (hist > 0) & (price > ma)), (-1, (hist < 0) & (price < ma))):
+            if (direction == 1 and not use_long) or (direction == -1 and not use_short):
+                continue
+            idx = live[(side[live] == 0) & open_signal]
+            if len(idx) == 0:
+                continue
+            size = sizes[idx] * wallet[idx] * leverage
+            fee = size * taker_fee
+            pos_size[idx] = size - fee
+            wallet[idx] -= fee
+            open_fee[idx] = fee
+            entry_price[idx] = price
+            side[idx] = direction
+
+    if day_wallets:
+        state.day_wallets = np.concatenate([state.day_wallets, np.array(day_wallets)])
+    if n_bars:
+        state.last_day = int(day[-1])
+        state.last_date = dates[-1]
+    return state.metrics()
+
+
+def _batch_metrics(day_wallets, wallet, total_trades, good_trades, sum_profit, pruned_rule, pruned_date):
+    """
+    Vectorized get_metrics over a (days x configs) wallet matrix and per-config trade counters.
+
+    Days after the pruning of a config are NaN and skipped, as pandas does in get_metrics.
+    Without any day in the period (no bar between start and end), every config gets the
+    no-trade row.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if len(day_wallets):
+            daily_return = np.diff(day_wallets, axis=0) / day_wallets[:-1]
+            sharpe_ratio = (365**0.5) * (np.nanmean(daily_return, axis=0) / np.nanstd(daily_return, axis=0, ddof=1))
+
+            wallet_ath = np.fmax.accumulate(day_wallets, axis=0)
+            max_drawdown = -np.nanmax((wallet_ath - day_wallets) / wallet_ath, axis=0) * 100
+        else:
+            # No trade can have been made either: the rows below are all no-trade rows
+            sharpe_ratio = max_drawdown = np.zeros(len(wallet))
+
+        win_rate = good_trades / total_trades
+        avg_profit = sum_profit / total_trades
+
+    # Same convention as Strategy.run_backtest when no trade was made
+    no_trade = total_trades == 0
+    return {
+        "sharpe_ratio": np.where(no_trade, 0, sharpe_ratio),
+        "win_rate": np.where(no_trade, 0, win_rate),
+        "avg_profit": np.where(no_trade, 0, avg_profit),
+        "total_trades": total_trades,
+        "max_drawdown": np.where(no_trade, 0, max_drawdown),
+        "wallet": np.where(no_trade, 0, wallet),
+        "status": np.where(pruned_rule >= 0, "pruned", "completed"),
+        "pruned_rule": np.array([PruningRules.RULES[rule] if rule >= 0 else None for rule in pruned_rule], dtype=object),
+        "pruned_date": pruned_date.copy(),
+    }
@@ -0,0 +1,150 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def nbytes(value):
+    """Memory held by a cached value: deep memory usage of pandas objects, nbytes of arrays."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True, index=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """ Size-bounded, thread-safe LRU mapping with hit/miss counters
+
+        Args:
+            maxsize(int): maximum number of entries kept (None: no limit), the least recently
+                used is evicted first,
+            maxbytes(int): maximum total memory of the values (None: no limit), measured by nbytes;
+                a value larger than maxbytes on its own is returned but not kept
+    """
+
+    def __init__(self, maxsize=128, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.lock = threading.Lock()
+        self._data = OrderedDict()
+        self._sizes = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = nbytes(value) if self.maxbytes is not None else 0
+        with self.lock:
+            self._pop(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            while (self.maxsize is not None and len(self._data) > self.maxsize) or \
+                    (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key):
+        if key in self._data:
+            del self._data[key]
+            self.nbytes -= self._sizes.pop(key)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value of key, calling compute() and storing its result on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            # Computed outside the lock: two threads missing the same key both compute it
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self.nbytes,
+                "maxbytes": self.maxbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+def fingerprint(data):
+    """
+    Hash the index and values of a Series/DataFrame so identical data loaded twice share cache keys.
+
+    Parameters:
+        data (pd.Series | pd.DataFrame): Data to identify.
+
+    Returns:
+        str: md5 hex digest.
+    """
+    digest = hashlib.md5()
+    if isinstance(data.index, pd.DatetimeIndex):
+        digest.update(np.ascontiguousarray(data.index.asi8).data)
+    else:
+        digest.update(str(tuple(data.index)).encode())
+    if isinstance(data, pd.DataFrame):
+        digest.update(str(tuple(data.columns)).encode())
+    digest.update(np.ascontiguousarray(data.to_numpy(dtype=np.float64)).data)
+    return digest.hexdigest()
+
+
+class IndicatorCache(LRUCache):
+    """ Memoized indicator results shared across parameter combinations
+
+        Entries are keyed by (pair, timeframe, data fingerprint, indicator, params), so an
+        indicator depending only on part of a param set (e.g. the triple EMA of a Trix on
+        trix_length) is computed once for every combination sharing that part.
+    """
+
+    def indicator(self, name, params, compute, data_key, pair=None, timeframe=None):
+        """
+        Return the cached indicator, computing it on a miss.
+
+        :param name: indicator name, e.g. "trix_line"
+        :param params: tuple of the parameters the indicator depends on
+        :param compute: function without argument computing the indicator
+        :param data_key: fingerprint of the input data (see fingerprint())
+        :param pair: pair label, only used to keep keys readable
+        :param timeframe: timeframe label, only used to keep keys readable
+        """
+        return self.get_or_compute((pair, timeframe, data_key, name, tuple(params)), compute)
+
+
+# Process-wide cache used by the Trix indicators and the strategies
+indicator_cache = IndicatorCache(maxsize=512)
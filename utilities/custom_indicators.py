@@ -1,10 +1,25 @@
 import math
+import os
+import time
 import numpy as np
 import pandas as pd
 import ta
-import math
-import requests
-from vectorbtpro import *
+from utilities.cache import IndicatorCache, fingerprint
+from utilities.kernels import adaptive_ma_kernel, ha_open_kernel, smoothed_ha_open_kernel, supertrend_kernel
+
+FEAR_AND_GREED_URL = "https://api.alternative.me/fng/?limit={limit}&format=json"
+# Downloaded data lives in the git-ignored database/ directory, next to database/exchanges
+FEAR_AND_GREED_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "cache", "fear_and_greed.csv")
+
+# Process-wide copy of the cached series: (file, mtime) -> DataFrame
+_fear_and_greed_memo = {}
+
+
+def _vbt():
+    # vectorbtpro is slow to import: only on the first computation needing it
+    import vectorbtpro as vbt
+    return vbt
 
 def get_n_columns(df, columns, n=1):
     dt = df.copy()
@@ -29,21 +44,94 @@ def chop(high, low, close, window=14):
                           (highh - lowl)) / np.log10(window)
     return pd.Series(chop_serie, name="CHOP")
 
-def fear_and_greed(close):
-    ''' Fear and greed indicator
+def _fetch_fear_and_greed(limit=0):
+    import requests
+
+    response = requests.get(FEAR_AND_GREED_URL.format(limit=limit), timeout=30)
+    response.raise_for_status()
+    fear = pd.DataFrame(response.json()['data'], columns=['timestamp', 'value'])
+    return fear.astype({'timestamp': 'int64', 'value': 'float64'})
+
+
+def _checked_file(cache_file):
+    # Touched at every API call, successful or not: its mtime is the time of the last check
+    return f"{cache_file}.checked"
+
+
+def _last_check(cache_file):
+    stamps = [os.stat(path).st_mtime for path in (cache_file, _checked_file(cache_file)) if os.path.exists(path)]
+    return max(stamps, default=None)
+
+
+def load_fear_and_greed(cache_file=FEAR_AND_GREED_FILE, offline=False, refresh_interval=3600):
+    ''' Daily fear and greed values, kept in a local csv (timestamp in seconds, value)
+
+        The API is only called when the cache lacks today's value and was not checked during
+        the last refresh_interval seconds, and then only for the missing days. If the API is
+        unreachable, the cached values are used; the failed check counts as a check, so the
+        API is not called again before refresh_interval.
+
+        Args:
+            cache_file(str): csv holding the series,
+            offline(bool): never call the API, the cache must exist,
+            refresh_interval(int): minimum seconds between two API checks
     '''
-    response = requests.get("https://api.alternative.me/fng/?limit=0&format=json")
-    dataResponse = response.json()['data']
-    fear = pd.DataFrame(dataResponse, columns = ['timestamp', 'value'])
+    fear = None
+    if os.path.exists(cache_file):
+        key = (cache_file, os.stat(cache_file).st_mtime_ns)
+        if key not in _fear_and_greed_memo:
+            _fear_and_greed_memo.clear()
+            _fear_and_greed_memo[key] = pd.read_csv(cache_file)
+        fear = _fear_and_greed_memo[key]
+    if offline:
+        if fear is None:
+            raise FileNotFoundError(f"No fear and greed cache at {cache_file}")
+        return fear
+
+    now = time.time()
+    up_to_date = fear is not None and len(fear) > 0 and fear['timestamp'].iloc[-1] > now - 86400
+    last_check = _last_check(cache_file)
+    recently_checked = last_check is not None and now - last_check < refresh_interval
+    if up_to_date or (recently_checked and fear is not None):
+        return fear
+    if recently_checked:
+        raise FileNotFoundError(
+            f"No fear and greed cache at {cache_file} and the API failed less than {refresh_interval}s ago")
+
+    # Only the days after the cached series (limit=0 returns the whole history)
+    limit = 0 if fear is None or len(fear) == 0 else int((now - fear['timestamp'].iloc[-1]) // 86400) + 2
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with open(_checked_file(cache_file), "a"):
+        os.utime(_checked_file(cache_file))
+    try:
+        new = _fetch_fear_and_greed(limit)
+    except Exception as e:
+        if fear is None:
+            raise
+        print(f"Fear and greed refresh failed, using the cache: {e}")
+        return fear
+
+    fear = pd.concat([fear, new], ignore_index=True) if fear is not None else new
+    fear = fear.drop_duplicates(subset='timestamp', keep='last').sort_values('timestamp').reset_index(drop=True)
+    # Atomic replace, parallel runs may refresh at the same time
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    fear.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, cache_file)
+    return fear
+
+
+def fear_and_greed(close, offline=False, cache_file=FEAR_AND_GREED_FILE):
+    ''' Fear and greed indicator
 
-    fear = fear.set_index(fear['timestamp'])
-    fear.index = pd.to_datetime(fear.index, unit='s')
-    del fear['timestamp']
-    df = pd.DataFrame(close, columns = ['close'])
-    df['fearResult'] = fear['value']
-    df['FEAR'] = df['fearResult'].ffill()
-    df['FEAR'] = df.FEAR.astype(float)
-    return pd.Series(df['FEAR'], name="FEAR")
+        Each bar gets the last daily value published at or before it (as-of join on the
+        timestamps), read from the local cache kept by load_fear_and_greed.
+    '''
+    fear = load_fear_and_greed(cache_file, offline=offline)
+    stamps = fear['timestamp'].to_numpy(dtype='int64') * 10**9
+    bars = pd.DatetimeIndex(close.index).asi8
+    rows = np.searchsorted(stamps, bars, side='right') - 1
+    values = np.where(rows >= 0, fear['value'].to_numpy(dtype=np.float64)[np.maximum(rows, 0)], np.nan)
+    return pd.Series(values, index=close.index, name="FEAR")
 
 
 class Trix():
@@ -53,6 +141,9 @@ class Trix():
             close(pd.Series): dataframe 'close' columns,
             trix_length(int): the window length for each mooving average of the trix,
             trix_signal_length(int): the window length for the signal line
+            cache(IndicatorCache): optional cache shared across parameter combinations,
+            pair(str): pair label of the cache keys,
+            timeframe(str): timeframe label of the cache keys
     """
 
     def __init__(
@@ -60,31 +151,51 @@ class Trix():
         close: pd.Series,
         trix_length: int = 9,
         trix_signal_length: int = 21,
-        trix_signal_type: str = "sma" # or ema
+        trix_signal_type: str = "sma", # or ema
+        cache: IndicatorCache = None,
+        pair: str = None,
+        timeframe: str = None
     ):
         self.close = close
         self.trix_length = trix_length
         self.trix_signal_length = trix_signal_length
         self.trix_signal_type = trix_signal_type
+        self.cache = cache
+        self.pair = pair
+        self.timeframe = timeframe
+        self.data_key = fingerprint(close) if cache is not None else None
         self._run()
 
+    def _cached(self, name, params, compute):
+        if self.cache is None:
+            return compute()
+        return self.cache.indicator(name, params, compute, self.data_key, self.pair, self.timeframe)
+
     def _run(self):
-        self.trix_line = ta.trend.ema_indicator(
+        # The triple EMA only depends on trix_length, the signal on (trix_length, signal length, type)
+        self.trix_line = self._cached("trix_line", (self.trix_length,), lambda: ta.trend.ema_indicator(
             ta.trend.ema_indicator(
                 ta.trend.ema_indicator(
                     close=self.close, window=self.trix_length),
-                window=self.trix_length), window=self.trix_length)
-        
-        self.trix_pct_line = self.trix_line.pct_change()*100
+                window=self.trix_length), window=self.trix_length))
+
+        self.trix_pct_line = self._cached("trix_pct_line", (self.trix_length,), lambda: self.trix_line.pct_change()*100)
 
+        self.trix_signal_line = self._cached(
+            "trix_signal_line",
+            (self.trix_length, self.trix_signal_length, self.trix_signal_type),
+            self._compute_signal_line
+        )
+
+        self.trix_histo = self.trix_pct_line - self.trix_signal_line
+
+    def _compute_signal_line(self):
         if self.trix_signal_type == "sma":
-            self.trix_signal_line = ta.trend.sma_indicator(
+            return ta.trend.sma_indicator(
                 close=self.trix_pct_line, window=self.trix_signal_length)
         elif self.trix_signal_type == "ema":
-            self.trix_signal_line = ta.trend.ema_indicator(
+            return ta.trend.ema_indicator(
                 close=self.trix_pct_line, window=self.trix_signal_length)
-            
-        self.trix_histo = self.trix_pct_line - self.trix_signal_line
 
     def get_trix_line(self) -> pd.Series:
         return pd.Series(self.trix_line, name="trix_line")
@@ -182,6 +293,15 @@ class VMC():
 
 
 def heikinAshiDf(df):
+    df['HA_Close'] = (df.open + df.high + df.low + df.close)/4
+    df['HA_Open'] = ha_open_kernel(
+        (df.open.iloc[0] + df.close.iloc[0]) / 2, df['HA_Close'].to_numpy(dtype=np.float64))
+    df['HA_High'] = df[['HA_Open', 'HA_Close', 'high']].max(axis=1)
+    df['HA_Low'] = df[['HA_Open', 'HA_Close', 'low']].min(axis=1)
+    return df
+
+def heikinAshiDf_reference(df):
+    """ Reference pandas implementation of heikinAshiDf, kept for equivalence checks """
     df['HA_Close'] = (df.open + df.high + df.low + df.close)/4
     ha_open = [(df.open[0] + df.close[0]) / 2]
     [ha_open.append((ha_open[i] + df.HA_Close.values[i]) / 2)
@@ -192,16 +312,24 @@ def heikinAshiDf(df):
     return df
 
 class SmoothedHeikinAshi():
-    def __init__(self, open, high, low, close, smooth1=5, smooth2=3):
+    def __init__(self, open, high, low, close, smooth1=5, smooth2=3, reference=False):
         self.open = open.copy()
         self.high = high.copy()
         self.low = low.copy()
         self.close = close.copy()
         self.smooth1 = smooth1
         self.smooth2 = smooth2
+        self.reference = reference
         self._run()
 
     def _calculate_ha_open(self):
+        return pd.Series(smoothed_ha_open_kernel(
+            self.smooth_open.to_numpy(dtype=np.float64),
+            self.smooth_close.to_numpy(dtype=np.float64),
+            self.ha_close.to_numpy(dtype=np.float64),
+        ), index=self.open.index)
+
+    def _calculate_ha_open_reference(self):
         ha_open = pd.Series(np.nan, index=self.open.index)
         start = 0
         for i in range(1, len(ha_open)):
@@ -224,7 +352,7 @@ class SmoothedHeikinAshi():
         self.smooth_close = ta.trend.ema_indicator(self.close, self.smooth1)
 
         self.ha_close = (self.smooth_open + self.smooth_high + self.smooth_low + self.smooth_close) / 4
-        self.ha_open = self._calculate_ha_open()
+        self.ha_open = self._calculate_ha_open_reference() if self.reference else self._calculate_ha_open()
         
 
         self.smooth_ha_close = ta.trend.ema_indicator(self.ha_close, self.smooth2)
@@ -256,16 +384,42 @@ class SuperTrend():
         low,
         close,
         atr_window=10,
-        atr_multi=3
+        atr_multi=3,
+        reference=False
     ):
         self.high = high
         self.low = low
         self.close = close
         self.atr_window = atr_window
         self.atr_multi = atr_multi
-        self._run()
-        
+        if reference:
+            self._run_reference()
+        else:
+            self._run()
+
+    def _bands(self):
+        price_diffs = [self.high - self.low,
+                    self.high - self.close.shift(),
+                    self.close.shift() - self.low]
+        true_range = pd.concat(price_diffs, axis=1)
+        true_range = true_range.abs().max(axis=1)
+        atr = true_range.ewm(alpha=1/self.atr_window,min_periods=self.atr_window).mean()
+        hl2 = (self.high + self.low) / 2
+        return hl2 + (self.atr_multi * atr), hl2 - (self.atr_multi * atr)
+
     def _run(self):
+        upperband, lowerband = self._bands()
+        final_upperband = upperband.to_numpy(dtype=np.float64, copy=True)
+        final_lowerband = lowerband.to_numpy(dtype=np.float64, copy=True)
+        supertrend = supertrend_kernel(self.close.to_numpy(dtype=np.float64), final_upperband, final_lowerband)
+
+        self.st = pd.DataFrame({
+            'Supertrend': supertrend,
+            'Final Lowerband': final_lowerband,
+            'Final Upperband': final_upperband
+        }, index=upperband.index)
+
+    def _run_reference(self):
         # calculate ATR
         price_diffs = [self.high - self.low, 
                     self.high - self.close.shift(), 
@@ -340,7 +494,8 @@ class MaSlope():
         major_length: int = 14,
         minor_length: int = 6,
         slope_period: int = 34,
-        slope_ir: int = 25
+        slope_ir: int = 25,
+        reference: bool = False
     ):
         self.close = close
         self.high = high
@@ -350,6 +505,7 @@ class MaSlope():
         self.minor_length = minor_length
         self.slope_period = slope_period
         self.slope_ir = slope_ir
+        self.reference = reference
         self._run()
 
     def _run(self):
@@ -364,12 +520,15 @@ class MaSlope():
         df.loc[df['hh'] != df['ll'],'mult'] = abs(2 * df['close'] - df['ll'] - df['hh']) / (df['hh'] - df['ll'])
         df['final'] = df['mult'] * (minAlpha - majAlpha) + majAlpha
 
-        ma_first = (df.iloc[0]['final']**2) * df.iloc[0]['close']
+        if self.reference:
+            ma_first = (df.iloc[0]['final']**2) * df.iloc[0]['close']
 
-        col_ma = [ma_first]
-        for i in range(1, len(df)):
-            ma1 = col_ma[i-1]
-            col_ma.append(ma1 + (df.iloc[i]['final']**2) * (df.iloc[i]['close'] - ma1))
+            col_ma = [ma_first]
+            for i in range(1, len(df)):
+                ma1 = col_ma[i-1]
+                col_ma.append(ma1 + (df.iloc[i]['final']**2) * (df.iloc[i]['close'] - ma1))
+        else:
+            col_ma = adaptive_ma_kernel(df['close'].to_numpy(dtype=np.float64), df['final'].to_numpy(dtype=np.float64))
 
         df['ma'] = col_ma
         pi = math.atan(1) * 4
@@ -406,6 +565,9 @@ class TrixVBT():
             close(pd.Series): dataframe 'close' columns,
             trix_length(int): the window length for each mooving average of the trix,
             trix_signal_length(int): the window length for the signal line
+            cache(IndicatorCache): optional cache shared across parameter combinations,
+            pair(str): pair label of the cache keys,
+            timeframe(str): timeframe label of the cache keys
     """
 
     def __init__(
@@ -414,41 +576,67 @@ class TrixVBT():
             trix_length: int = 9,
             trix_signal_length: int = 21,
             trix_signal_type: str = "sma", # or ema
-            long_ma_length: int = 100
+            long_ma_length: int = 100,
+            cache: IndicatorCache = None,
+            pair: str = None,
+            timeframe: str = None
     ):
         self.vbt_data = vbt_data
         self.trix_length = trix_length
         self.trix_signal_length = trix_signal_length
         self.trix_signal_type = trix_signal_type
         self.long_ma_length = long_ma_length
+        self.cache = cache
+        self.pair = pair
+        self.timeframe = timeframe
         self._run()
 
+    def _cached(self, name, params, compute):
+        if self.cache is None:
+            return compute()
+        return self.cache.indicator(name, params, compute, self.data_key, self.pair, self.timeframe)
+
     def _run(self):
-        self.long_ma = vbt.talib("EMA").run(self.vbt_data.get("Close"), self.long_ma_length).real
-        self.long_ma = self.long_ma.droplevel(level=0, axis=1)
+        close = self.vbt_data.get("Close")
+        self.data_key = fingerprint(close) if self.cache is not None else None
+
+        self.long_ma = self._cached(
+            "long_ma", (self.long_ma_length,),
+            lambda: _vbt().talib("EMA").run(close, self.long_ma_length).real.droplevel(level=0, axis=1)
+        )
 
         # Step 1: Calculate the TRIX line
-        self.trix_line = vbt.talib("TRIX").run(self.vbt_data.get("Close"), self.trix_length).real
+        self.trix_line = self._cached(
+            "trix_line", (self.trix_length,), lambda: _vbt().talib("TRIX").run(close, self.trix_length).real
+        )
 
         # Step 2: Compute the percentage change of the TRIX line
-        self.trix_pct_line = self.trix_line.pct_change() * 100
+        trix_pct_line = self._cached("trix_pct_line", (self.trix_length,), lambda: self.trix_line.pct_change() * 100)
 
         # Step 3: Determine the signal line based on the specified type
+        self.trix_signal_line = self._cached(
+            "trix_signal_line",
+            (self.trix_length, self.trix_signal_length, self.trix_signal_type),
+            lambda: self._compute_signal_line(trix_pct_line)
+        )
+
+        # Align the MultiIndex levels by removing the extra level
+        self.trix_pct_line = trix_pct_line.droplevel(level=0, axis=1)
+
+        # Calculate the TRIX histogram
+        self.trix_histo = self.trix_pct_line - self.trix_signal_line
+
+    def _compute_signal_line(self, trix_pct_line):
         if self.trix_signal_type == "sma":
-            self.trix_signal_line = vbt.talib("SMA").run(self.trix_pct_line, self.trix_signal_length).real
+            trix_signal_line = _vbt().talib("SMA").run(trix_pct_line, self.trix_signal_length).real
         elif self.trix_signal_type == "ema":
-            self.trix_signal_line = vbt.talib("EMA").run(self.trix_pct_line, self.trix_signal_length).real
+            trix_signal_line = _vbt().talib("EMA").run(trix_pct_line, self.trix_signal_length).real
         else:
             raise ValueError("Invalid trix_signal_type. Choose 'sma' or 'ema'.")
 
         # Align the MultiIndex levels by removing the extra level
-        self.trix_signal_line = self.trix_signal_line.droplevel(level=0, axis=1)
-        self.trix_signal_line = self.trix_signal_line.droplevel(level=0, axis=1)
-
-        self.trix_pct_line = self.trix_pct_line.droplevel(level=0, axis=1)
-
-        # Calculate the TRIX histogram
-        self.trix_histo = self.trix_pct_line - self.trix_signal_line
+        trix_signal_line = trix_signal_line.droplevel(level=0, axis=1)
+        return trix_signal_line.droplevel(level=0, axis=1)
 
     def get_trix_line(self):
         return self.trix_line
@@ -1,52 +1,87 @@
 import asyncio
+import hashlib
+import time
 from posixpath import dirname
 from pathlib import Path
-import ccxt.async_support as ccxt
 import pytz
+import json
+import numpy as np
 import pandas as pd
 import os
+import shutil
+import tempfile
+import threading
 from datetime import datetime, timedelta
 from tqdm.auto import tqdm
-from asyncio import Semaphore
+from utilities.cache import LRUCache
+from utilities.tensor import AlignedTensor
 
-sem = Semaphore(500) # 500 concurrent requests
+
+class TokenBucket:
+    """ Limiteur de débit asynchrone : rate requêtes par seconde, avec des rafales jusqu'à capacity
+
+        Chaque acquire() réserve un jeton, et attend s'il faut que le seau se remplisse. Pas de verrou :
+        la réservation est faite sans await, ce qui suffit dans une boucle asyncio.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+
+    async def acquire(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
 
 
 class ExchangeDataManager:
 
-    # Liste des exchanges à supporter
+    # Liste des exchanges à supporter : nom de la classe ccxt.async_support, instanciée au premier usage
     CCXT_EXCHANGES = {
         "binance": {
-            "ccxt_object": ccxt.binance(config={'enableRateLimit': True}),
-            "limit_size_request": 1000
+            "ccxt_class": "binance",
+            "limit_size_request": 1000,
+            "rate_limit": 20
         },
         "binanceusdm": {
-            "ccxt_object": ccxt.binanceusdm(config={'enableRateLimit': True}),
-            "limit_size_request": 1000
+            "ccxt_class": "binanceusdm",
+            "limit_size_request": 1000,
+            "rate_limit": 20
         },
         "kucoin": {
-            "ccxt_object": ccxt.kucoin(config={'enableRateLimit': True}),
-            "limit_size_request": 200
+            "ccxt_class": "kucoin",
+            "limit_size_request": 200,
+            "rate_limit": 10
         },
         "kucoinfutures": {
-            "ccxt_object": ccxt.kucoinfutures(config={'enableRateLimit': True}),
-            "limit_size_request": 200
+            "ccxt_class": "kucoinfutures",
+            "limit_size_request": 200,
+            "rate_limit": 10
         },
         "okx": {
-            "ccxt_object": ccxt.okx(config={'enableRateLimit': True}),
-            "limit_size_request": 100
+            "ccxt_class": "okx",
+            "limit_size_request": 100,
+            "rate_limit": 10
         },
         "bitget": {
-            "ccxt_object": ccxt.bitget(config={'enableRateLimit': True}),
-            "limit_size_request": 200
+            "ccxt_class": "bitget",
+            "limit_size_request": 200,
+            "rate_limit": 10
         },
         "bybit": {
-            "ccxt_object": ccxt.bybit(config={'enableRateLimit': True}),
-            "limit_size_request": 1000
+            "ccxt_class": "bybit",
+            "limit_size_request": 1000,
+            "rate_limit": 10
         },
         "bitmart": {
-            "ccxt_object": ccxt.bitmart(config={'enableRateLimit': True}),
-            "limit_size_request": 1000
+            "ccxt_class": "bitmart",
+            "limit_size_request": 1000,
+            "rate_limit": 5
         },
     }
 
@@ -102,7 +137,40 @@ class ExchangeDataManager:
         }
     }
 
-    def __init__(self, exchange_name, path_download="./") -> None:
+    # Fichiers déjà lus par load_data, clé (fichier, mtime, taille), bornés à 2 Go de trames en
+    # mémoire (voir cache_info). Un dossier partitionné est mis en cache mois par mois
+    LOAD_CACHE = LRUCache(maxsize=None, maxbytes=2 * 1024**3)
+
+    # Décalage en ms du début des bougies agrégées localement : les semaines commencent le lundi,
+    # le 1er janvier 1970 était un jeudi
+    RESAMPLE_OFFSETS_MS = {
+        "1w": 4 * 86400000,
+    }
+
+    # Formats de stockage des fichiers OHLCV : extension de fichier. "partitioned" est un dossier
+    # contenant un fichier parquet par mois (YYYY-MM.parquet)
+    STORAGES = {
+        "csv": ".csv",
+        "parquet": ".parquet",
+        "feather": ".feather",
+        "partitioned": ".parts",
+    }
+
+    OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+    # Objets ccxt déjà construits, un par exchange (clé : nom de l'exchange)
+    CCXT_OBJECTS = {}
+
+    # Un seul limiteur par exchange, partagé par toutes les instances (clé : nom de l'exchange)
+    RATE_LIMITERS = {}
+
+    # Un verrou par fichier écrit depuis le chemin de lecture (agrégats, catalogue), partagé par
+    # tous les threads (clé : chemin du fichier)
+    FILE_LOCKS = {}
+    FILE_LOCKS_GUARD = threading.Lock()
+
+    def __init__(self, exchange_name, path_download="./", storage="csv", keep_arrays=False, exchange=None,
+                 max_retries=5, retry_delay=1) -> None:
         """La fonction prend une chaîne et si possible la convertit en objet ccxt.
         La fonction crée également un chemin vers un dossier appelé nommé dans le répertoire parent
         du répertoire courant, et crée un sous-dossier dans ce dossier avec le nom de l'échange.
@@ -110,6 +178,16 @@ class ExchangeDataManager:
         Args:
             cex (_type_): L'échange que vous souhaitez utiliser
             path_download (str, optional): Chemin du dossier à créer exemple ./database. Defaults to "./".
+            storage (str, optional): Format des fichiers OHLCV, "csv", ou "parquet"/"feather" (colonnes
+                typées : index date int64 en ms et colonnes float64), ou "partitioned" (un fichier parquet
+                par mois, seuls les mois demandés sont lus). Defaults to "csv".
+            keep_arrays (bool, optional): Tient à jour une copie .npy de chaque fichier après chaque
+                téléchargement, lisible en mémoire partagée par load_arrays. Defaults to False.
+            exchange (optional): Objet exchange à utiliser à la place de l'objet ccxt, par exemple un faux
+                exchange local exposant load_markets, fetch_ohlcv et close. Defaults to None.
+            max_retries (int, optional): Nombre d'essais par requête. Defaults to 5.
+            retry_delay (float, optional): Attente en secondes avant le 2e essai, doublée à chaque échec.
+                Defaults to 1.
 
         Raises:
             NotImplementedError: Raise si l'exchange n'est pas paramétré/supporté
@@ -121,147 +199,940 @@ class ExchangeDataManager:
         except Exception:
             raise NotImplementedError(
                 f"L'échange {self.exchange_name} n'est pas supporté")
+        if storage not in ExchangeDataManager.STORAGES:
+            raise ValueError(f"Format de stockage {storage} inconnu, choisir parmi {list(ExchangeDataManager.STORAGES)}")
+        self.storage = storage
+        self.keep_arrays = keep_arrays
         self.intervals_dict = ExchangeDataManager.INTERVALS
         
-        self.exchange = self.exchange_dict["ccxt_object"]
-        
+        # L'objet ccxt n'est construit qu'au premier accès à self.exchange
+        self._exchange = exchange
+        self.rate_limiter = ExchangeDataManager.RATE_LIMITERS.setdefault(
+            self.exchange_name, TokenBucket(self.exchange_dict["rate_limit"]))
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
         self.path_data = str(
             Path(os.path.join(dirname(__file__), self.path_download, self.exchange_name)).resolve())
         os.makedirs(self.path_data, exist_ok=True)
         self.pbar = None
+        self._catalog = None
+
+    @property
+    def exchange(self):
+        if self._exchange is None:
+            self._exchange = ExchangeDataManager.get_ccxt_exchange(self.exchange_name)
+        return self._exchange
+
+    @staticmethod
+    def get_ccxt_exchange(exchange_name):
+        """
+        Renvoie l'objet ccxt.async_support de l'exchange, importé et construit au premier appel
+        puis partagé par toutes les instances
+
+        :param exchange_name: le nom de l'exchange, clé de CCXT_EXCHANGES
+        """
+        if exchange_name not in ExchangeDataManager.CCXT_OBJECTS:
+            import ccxt.async_support as ccxt
+
+            ccxt_class = getattr(ccxt, ExchangeDataManager.CCXT_EXCHANGES[exchange_name]["ccxt_class"])
+            ExchangeDataManager.CCXT_OBJECTS[exchange_name] = ccxt_class(config={'enableRateLimit': True})
+        return ExchangeDataManager.CCXT_OBJECTS[exchange_name]
 
     def load_data(self, coin, interval, start_date="1990", end_date="2050") -> pd.DataFrame:
         """
         Cette fonction prend une paire, un intervalle, une date de début et une date de fin et renvoie
         une trame de données des données OHLCV pour cette paire
 
+        Le fichier n'est lu qu'une fois tant qu'il n'est pas modifié : les lectures suivantes sont
+        servies par un cache LRU partagé (voir cache_info) et renvoient une copie.
+        Si l'intervalle n'a pas été téléchargé, il est agrégé depuis un intervalle plus fin présent
+        sur le disque (voir update_derived).
+
         :param coin: la paire pour laquelle vous souhaitez obtenir des données
         :param interval: l'intervalle de temps entre chaque point de données
         :param start_date: La date de début des données que vous souhaitez charger
         :param end_date: La date à laquelle vous souhaitez mettre fin à vos données
         """
-        file_path = f"{self.path_data}/{interval}/"
-        file_name = f"{file_path}{coin.replace('/', '-').replace(':', '-')}.csv"
+        file_name = self.get_file_name(coin, interval)
         if not os.path.exists(file_name):
-            raise FileNotFoundError(f"Le fichier {file_name} n'existe pas")
+            if self.get_base_interval(coin, interval) is None:
+                raise FileNotFoundError(f"Le fichier {file_name} n'existe pas")
+            # Pas de fichier téléchargé : on agrège localement un intervalle plus fin. Les bougies
+            # agrégées sont toutes terminées, il n'y a pas de dernière bougie en cours à retirer.
+            # Le verrou empêche un autre thread de lire le fichier agrégé pendant qu'il est écrit
+            with self._file_lock(self.get_derived_file_name(coin, interval)):
+                df = self._read_cached(self.update_derived(coin, interval), start_date, end_date)
+            return df.loc[start_date:end_date].copy()
 
-        df = pd.read_csv(file_name, index_col=0)
-        df.index = pd.to_datetime(df.index, unit='ms')
-        df = df.groupby(df.index).first()
+        df = self._read_cached(file_name, start_date, end_date)
         df = df.loc[start_date:end_date]
         df = df.iloc[:-1]
 
+        return df.copy()
+
+    def load_tensor(self, coins, interval, start_date="1990", end_date="2050", fields=None) -> AlignedTensor:
+        """
+        Charge plusieurs paires d'un même intervalle (voir load_data) alignées sur un axe de dates
+        commun, dans un seul tableau float64 (dates x paires x champs)
+
+        :param coins: la liste des paires
+        :param interval: l'intervalle, ex. 1h
+        :param start_date: La date de début des données que vous souhaitez charger
+        :param end_date: La date à laquelle vous souhaitez mettre fin à vos données
+        :param fields: les colonnes à empiler, OHLCV par défaut
+        :return: un AlignedTensor, avec les masques valid (la paire a une bougie) et listed (la paire
+        est déjà listée)
+        """
+        frames = {coin: self.load_data(coin, interval, start_date, end_date) for coin in coins}
+        return AlignedTensor.from_frames(frames, fields or ExchangeDataManager.OHLCV_COLUMNS)
+
+    @staticmethod
+    def _read_cached(file_name, start_date=None, end_date=None):
+        if not file_name.endswith(".parts"):
+            size, mtime_ns = ExchangeDataManager._file_stat(file_name)
+            return ExchangeDataManager.LOAD_CACHE.get_or_compute(
+                (file_name, mtime_ns, size), lambda: ExchangeDataManager.read_ohlcv(file_name))
+
+        # Stockage partitionné : seuls les mois de [start_date, end_date] sont lus, chacun ayant sa
+        # propre entrée, partagée par toutes les plages qui le couvrent
+        months = None
+        if start_date is not None or end_date is not None:
+            months = ExchangeDataManager._month_range(start_date, end_date)
+        frames = []
+        for part in ExchangeDataManager._partitions(file_name, months):
+            size, mtime_ns = ExchangeDataManager._file_stat(part)
+            frames.append(ExchangeDataManager.LOAD_CACHE.get_or_compute(
+                (part, mtime_ns, size), lambda part=part: ExchangeDataManager.read_ohlcv(part)))
+        if not frames:
+            return ExchangeDataManager.read_ohlcv(file_name, months)
+        return pd.concat(frames) if len(frames) > 1 else frames[0]
+
+    @staticmethod
+    def _file_lock(file_name):
+        """Verrou (réentrant) du fichier, partagé par tous les threads du processus"""
+        with ExchangeDataManager.FILE_LOCKS_GUARD:
+            return ExchangeDataManager.FILE_LOCKS.setdefault(os.path.abspath(file_name), threading.RLock())
+
+    @staticmethod
+    def _file_stat(file_name):
+        """Taille et date de modification d'un fichier, ou de l'ensemble des partitions d'un dossier"""
+        if os.path.isdir(file_name):
+            stats = [os.stat(part) for part in ExchangeDataManager._partitions(file_name)]
+            return sum(st.st_size for st in stats), max((st.st_mtime_ns for st in stats), default=0)
+        file_stat = os.stat(file_name)
+        return file_stat.st_size, file_stat.st_mtime_ns
+
+    # -- Stockage partitionné : {paire}.parts/YYYY-MM.parquet --
+
+    @staticmethod
+    def _month_range(start_date=None, end_date=None):
+        """Premier et dernier mois (YYYY-MM) couverts par des dates au format accepté par .loc"""
+        return (
+            ExchangeDataManager._month(start_date) if start_date is not None else None,
+            ExchangeDataManager._month(end_date, end=True) if end_date is not None else None,
+        )
+
+    @staticmethod
+    def _month(date, end=False):
+        # Comme pour .loc, une date partielle en fin de plage ("2024", "2024-03") désigne toute la période
+        date = str(date)
+        for freq, length in (("Y", 4), ("M", 7)):
+            if end and len(date) == length:
+                return str(pd.Period(date, freq=freq).end_time.to_datetime64().astype("datetime64[M]"))
+        return str(pd.Timestamp(date).to_datetime64().astype("datetime64[M]"))
+
+    @staticmethod
+    def _partitions(file_name, months=None):
+        """
+        Partitions d'un dossier triées par mois, limitées aux mois [début, fin] de months si donné
+        """
+        parts = sorted(name for name in os.listdir(file_name) if name.endswith(".parquet"))
+        if months is not None:
+            start, end = months
+            parts = [
+                name for name in parts
+                if (start is None or name[:7] >= start) and (end is None or name[:7] <= end)
+            ]
+        return [os.path.join(file_name, name) for name in parts]
+
+    @staticmethod
+    def _write_partitions(file_name, df, append):
+        """
+        Écrit df dans un fichier parquet par mois ; avec append, seuls les mois touchés sont relus
+        et réécrits
+
+        :return: True si toutes les nouvelles dates sont postérieures aux données déjà présentes
+        """
+        if not append and os.path.exists(file_name):
+            shutil.rmtree(file_name)
+        os.makedirs(file_name, exist_ok=True)
+        dates = df["date"].to_numpy(dtype="int64")
+        months = dates.astype("datetime64[ms]").astype("datetime64[M]")
+        only_after = True
+        for month in np.unique(months):
+            part = df[months == month]
+            part_file = os.path.join(file_name, f"{month}.parquet")
+            if os.path.exists(part_file):
+                old = pd.read_parquet(part_file)
+                only_after = only_after and part["date"].min() > old["date"].max()
+                part = pd.concat([old, part], ignore_index=True)
+            part = part.astype({"date": "int64", **{col: "float64" for col in ExchangeDataManager.OHLCV_COLUMNS}})
+            part = part.drop_duplicates(subset="date", keep="first").sort_values("date").reset_index(drop=True)
+            part.to_parquet(part_file, index=False)
+        return only_after
+
+    def get_file_name(self, coin, interval, storage=None):
+        """
+        Renvoie le chemin du fichier OHLCV d'une paire et d'un intervalle
+
+        :param coin: la paire, ex. BTC/USDT
+        :param interval: l'intervalle, ex. 1h
+        :param storage: le format de stockage, celui du manager par défaut
+        """
+        extension = ExchangeDataManager.STORAGES[storage or self.storage]
+        return f"{self.path_data}/{interval}/{coin.replace('/', '-').replace(':', '-')}{extension}"
+
+    @staticmethod
+    def read_raw(file_name, months=None) -> pd.DataFrame:
+        """
+        Lit un fichier OHLCV (csv, parquet, feather ou dossier partitionné) tel qu'il est stocké :
+        colonne date en ms puis les colonnes OHLCV
+
+        :param months: (premier, dernier) mois YYYY-MM à lire d'un dossier partitionné, tous par défaut
+        """
+        if file_name.endswith(".parts"):
+            parts = [pd.read_parquet(part) for part in ExchangeDataManager._partitions(file_name, months)]
+            if not parts:
+                return pd.DataFrame(columns=["date"] + ExchangeDataManager.OHLCV_COLUMNS)
+            return pd.concat(parts, ignore_index=True)
+        elif file_name.endswith(".parquet"):
+            return pd.read_parquet(file_name)
+        elif file_name.endswith(".feather"):
+            return pd.read_feather(file_name)
+        return pd.read_csv(file_name)
+
+    @staticmethod
+    def read_ohlcv(file_name, months=None) -> pd.DataFrame:
+        """
+        Lit un fichier OHLCV et renvoie une trame indexée par date, sans doublons
+        """
+        df = ExchangeDataManager.read_raw(file_name, months).set_index("date")
+        df.index = pd.DatetimeIndex(
+            df.index.to_numpy(dtype="int64").astype("datetime64[ms]").astype("datetime64[ns]"), name="date")
+        if not (df.index.is_monotonic_increasing and df.index.is_unique):
+            df = df.groupby(df.index).first()
+        return df
+
+    @staticmethod
+    def write_ohlcv(file_name, df, append=False):
+        """
+        Écrit des données OHLCV (colonne date en ms + colonnes OHLCV) au format donné par l'extension.
+        Le csv est complété en fin de fichier, sans les lignes déjà présentes ; les formats colonnes
+        sont réécrits avec des types fixes (date int64, OHLCV float64), triés et sans doublons.
+        En stockage partitionné, seuls les mois qui reçoivent des lignes sont réécrits.
+        L'index annexe du fichier (voir read_index) est mis à jour à chaque écriture.
+
+        :param file_name: le fichier à écrire
+        :param df: les nouvelles lignes
+        :param append: ajoute les lignes au fichier existant au lieu de le remplacer
+        """
+        df = df[["date"] + ExchangeDataManager.OHLCV_COLUMNS].reset_index(drop=True)
+        append = append and os.path.exists(file_name)
+        if file_name.endswith(".csv"):
+            index = ExchangeDataManager.read_index(file_name) if append else None
+            if append and index is None:
+                index = ExchangeDataManager.build_index(file_name)
+            if index is not None and index["last"] is not None:
+                # On ne réécrit pas les bougies qui se chevauchent avec la fin du fichier
+                df = df[df["date"] > index["last"]]
+            with open(file_name, mode='a' if append else 'w') as f:
+                df.to_csv(path_or_buf=f, header=not append, index=False)
+            ExchangeDataManager._write_index(
+                file_name, ExchangeDataManager._extend_index(file_name, index, df["date"].to_numpy(dtype="int64")))
+            return
+
+        if file_name.endswith(".parts"):
+            index = ExchangeDataManager.read_index(file_name) if append else None
+            only_after = ExchangeDataManager._write_partitions(file_name, df, append)
+            if append and (index is None or not only_after):
+                # Lignes insérées avant la fin des données : l'index est recalculé
+                ExchangeDataManager.build_index(file_name)
+            else:
+                new_dates = df["date"].to_numpy(dtype="int64")
+                if index is not None and index["last"] is not None:
+                    new_dates = new_dates[new_dates > index["last"]]
+                ExchangeDataManager._write_index(
+                    file_name, ExchangeDataManager._extend_index(file_name, index, new_dates))
+            return
+
+        if append:
+            df = pd.concat([ExchangeDataManager.read_raw(file_name), df], ignore_index=True)
+        df = df.astype({"date": "int64", **{col: "float64" for col in ExchangeDataManager.OHLCV_COLUMNS}})
+        df = df.drop_duplicates(subset="date", keep="first").sort_values("date").reset_index(drop=True)
+        if file_name.endswith(".parquet"):
+            df.to_parquet(file_name, index=False)
+        else:
+            df.to_feather(file_name)
+        ExchangeDataManager._write_index(
+            file_name, ExchangeDataManager._extend_index(file_name, None, df["date"].to_numpy()))
+
+    # -- Index annexe : premier/dernier timestamp, nombre de lignes et trous, sans relire le fichier --
+
+    @staticmethod
+    def _index_file(file_name):
+        return f"{file_name}.idx.json"
+
+    @staticmethod
+    def _interval_ms(file_name):
+        # Les fichiers sont rangés dans {path_data}/{interval}/ ; les mois n'ont pas de durée fixe
+        interval = os.path.basename(os.path.dirname(file_name))
+        if interval == "1M":
+            return None
+        return ExchangeDataManager.INTERVALS.get(interval, {}).get("interval_ms")
+
+    @staticmethod
+    def _find_gaps(dates, interval_ms, previous=None):
+        """Plages [début, fin] en ms des bougies manquantes dans dates (triées), après previous si donné."""
+        if interval_ms is None or len(dates) == 0:
+            return []
+        if previous is not None:
+            dates = np.concatenate([[previous], dates])
+        holes = np.flatnonzero(np.diff(dates) > interval_ms)
+        return [[int(dates[i]) + interval_ms, int(dates[i + 1]) - interval_ms] for i in holes]
+
+    @staticmethod
+    def _extend_index(file_name, index, new_dates):
+        """Index du fichier après ajout de new_dates (triées, plus récentes que index["last"])."""
+        new_dates = np.unique(new_dates)
+        interval_ms = ExchangeDataManager._interval_ms(file_name)
+        if index is None or index["rows"] == 0:
+            index = {"first": None, "last": None, "previous": None, "rows": 0, "gaps": []}
+        if len(new_dates) == 0:
+            return index
+
+        last_dates = [index["previous"], index["last"]] + new_dates[-2:].tolist()
+        last_dates = [date for date in last_dates if date is not None]
+        return {
+            "first": index["first"] if index["first"] is not None else int(new_dates[0]),
+            "last": int(last_dates[-1]),
+            "previous": int(last_dates[-2]) if len(last_dates) > 1 else None,
+            "rows": index["rows"] + len(new_dates),
+            "gaps": index["gaps"] + ExchangeDataManager._find_gaps(new_dates, interval_ms, index["last"]),
+        }
+
+    @staticmethod
+    def _write_index(file_name, index):
+        size, mtime_ns = ExchangeDataManager._file_stat(file_name)
+        index = dict(index, interval_ms=ExchangeDataManager._interval_ms(file_name), size=size, mtime_ns=mtime_ns)
+        ExchangeDataManager._write_atomic(ExchangeDataManager._index_file(file_name), lambda f: json.dump(index, f))
+
+    @staticmethod
+    def _write_atomic(file_name, write, mode="w"):
+        """
+        Écrit file_name avec write(f) dans un fichier temporaire unique du même dossier, puis le met
+        en place par os.replace : les lecteurs voient l'ancien ou le nouveau fichier, jamais un
+        fichier partiel
+        """
+        fd, tmp_file = tempfile.mkstemp(
+            dir=os.path.dirname(file_name) or ".", prefix=os.path.basename(file_name) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp_file, file_name)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    @staticmethod
+    def read_index(file_name):
+        """
+        Renvoie l'index annexe d'un fichier OHLCV (first, last, previous en ms, rows, gaps), ou None
+        s'il n'existe pas ou ne correspond plus au fichier (taille ou date de modification différente)
+        """
+        try:
+            with open(ExchangeDataManager._index_file(file_name)) as f:
+                index = json.load(f)
+            size, mtime_ns = ExchangeDataManager._file_stat(file_name)
+        except (OSError, ValueError):
+            return None
+        if index.get("size") != size or index.get("mtime_ns") != mtime_ns:
+            return None
+        return index
+
+    @staticmethod
+    def build_index(file_name):
+        """
+        Construit l'index annexe d'un fichier OHLCV en le lisant entièrement, et l'écrit
+        """
+        dates = ExchangeDataManager.read_ohlcv(file_name).index.asi8 // 10**6
+        index = ExchangeDataManager._extend_index(file_name, None, dates)
+        ExchangeDataManager._write_index(file_name, index)
+        return index
+
+    # -- Intervalles agrégés localement depuis un intervalle plus fin, stockés dans {path_data}/derived --
+
+    def get_derived_file_name(self, coin, interval):
+        """
+        Renvoie le chemin du fichier d'un intervalle agrégé localement
+        """
+        extension = ExchangeDataManager.STORAGES[self.storage]
+        return f"{self.path_data}/derived/{interval}/{coin.replace('/', '-').replace(':', '-')}{extension}"
+
+    def get_base_interval(self, coin, interval):
+        """
+        Renvoie le plus grand intervalle téléchargé de la paire dont interval est un multiple,
+        ou None si interval ne peut pas être agrégé localement
+
+        :param coin: la paire, ex. BTC/USDT
+        :param interval: l'intervalle voulu, ex. 4h
+        """
+        if interval not in self.intervals_dict or interval == "1M":
+            return None
+        interval_ms = self.intervals_dict[interval]["interval_ms"]
+        bases = [
+            base for base, infos in self.intervals_dict.items()
+            if base not in (interval, "1M") and interval_ms % infos["interval_ms"] == 0
+            and os.path.exists(self.get_file_name(coin, base))
+        ]
+        if not bases:
+            return None
+        return max(bases, key=lambda base: self.intervals_dict[base]["interval_ms"])
+
+    @staticmethod
+    def resample_ohlcv(df, interval, complete_before=None):
+        """
+        Agrège des bougies triées (colonne date en ms puis OHLCV) en bougies de l'intervalle donné,
+        en une passe : open/close du premier/dernier élément, max/min/somme par segment
+
+        :param df: les bougies à agréger
+        :param interval: l'intervalle des bougies agrégées, ex. 4h
+        :param complete_before: timestamp ms ; seules les bougies agrégées finissant avant sont gardées
+        :return: un DataFrame au même format que df
+        """
+        if interval == "1M":
+            raise ValueError("Les bougies mensuelles ne peuvent pas être agrégées localement")
+        interval_ms = ExchangeDataManager.INTERVALS[interval]["interval_ms"]
+        offset = ExchangeDataManager.RESAMPLE_OFFSETS_MS.get(interval, 0)
+
+        dates = df["date"].to_numpy(dtype="int64")
+        buckets = (dates - offset) // interval_ms * interval_ms + offset
+        if complete_before is not None:
+            buckets = buckets[:np.count_nonzero(buckets + interval_ms <= complete_before)]
+        if len(buckets) == 0:
+            return pd.DataFrame(columns=["date"] + ExchangeDataManager.OHLCV_COLUMNS)
+
+        starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+        ends = np.append(starts[1:], len(buckets)) - 1
+        values = {col: df[col].to_numpy(dtype=np.float64)[:len(buckets)] for col in ExchangeDataManager.OHLCV_COLUMNS}
+        return pd.DataFrame({
+            "date": buckets[starts],
+            "open": values["open"][starts],
+            "high": np.maximum.reduceat(values["high"], starts),
+            "low": np.minimum.reduceat(values["low"], starts),
+            "close": values["close"][ends],
+            "volume": np.add.reduceat(values["volume"], starts),
+        })
+
+    def update_derived(self, coin, interval, base_interval=None):
+        """
+        Met à jour le fichier agrégé d'une paire depuis son intervalle de base. Seules les bougies
+        terminées sont écrites, et seules celles postérieures au fichier agrégé sont calculées :
+        grâce aux index annexes, rien n'est lu tant que la base n'a pas avancé d'une bougie complète.
+
+        :param coin: la paire, ex. BTC/USDT
+        :param interval: l'intervalle à agréger, ex. 4h
+        :param base_interval: l'intervalle téléchargé à agréger, par défaut get_base_interval
+        :return: le fichier agrégé
+        """
+        base_interval = base_interval or self.get_base_interval(coin, interval)
+        if base_interval is None:
+            raise FileNotFoundError(f"Aucun intervalle téléchargé pour agréger {coin} en {interval}")
+        base_file = self.get_file_name(coin, base_interval)
+        derived_file = self.get_derived_file_name(coin, interval)
+        # load_data l'appelle depuis le chemin de lecture : un seul thread à la fois met à jour un agrégat
+        with self._file_lock(derived_file):
+            return self._update_derived(coin, interval, base_file, derived_file)
+
+    def _update_derived(self, coin, interval, base_file, derived_file):
+        interval_ms = self.intervals_dict[interval]["interval_ms"]
+
+        # La dernière bougie de la base est en cours : une bougie agrégée est terminée si elle finit avant
+        base_last = (self.read_index(base_file) or self.build_index(base_file))["last"]
+        derived_index = None
+        if os.path.exists(derived_file):
+            derived_index = self.read_index(derived_file) or self.build_index(derived_file)
+        start = None
+        if derived_index is not None and derived_index["last"] is not None:
+            start = derived_index["last"] + interval_ms
+            if base_last is None or start + interval_ms > base_last:
+                return derived_file
+
+        base = self._read_cached(base_file, pd.Timestamp(start, unit="ms") if start is not None else None)
+        dates = base.index.asi8 // 10**6
+        if start is not None:
+            first_row = np.searchsorted(dates, start)
+            base, dates = base.iloc[first_row:], dates[first_row:]
+        new = self.resample_ohlcv(base.reset_index(drop=True).assign(date=dates), interval, complete_before=base_last)
+        if len(new):
+            os.makedirs(os.path.dirname(derived_file), exist_ok=True)
+            self.write_ohlcv(derived_file, new, append=derived_index is not None)
+            self.record_file(derived_file, coin)
+        return derived_file
+
+    def get_arrays_dir(self, coin, interval):
+        """
+        Renvoie le dossier des colonnes .npy d'une paire et d'un intervalle
+        """
+        return f"{self.path_data}/{interval}/{coin.replace('/', '-').replace(':', '-')}_npy"
+
+    def persist_arrays(self, coin, interval):
+        """
+        Écrit chaque colonne du fichier OHLCV en .npy à type fixe (date int64 en ms, OHLCV float64)
+        avec un fichier meta.json, pour que load_arrays puisse les ouvrir en memmap
+
+        :param coin: la paire, ex. BTC/USDT
+        :param interval: l'intervalle, ex. 1m
+        :return: le dossier écrit
+        """
+        df = self.read_ohlcv(self.get_file_name(coin, interval))
+        arrays_dir = self.get_arrays_dir(coin, interval)
+        meta_file = os.path.join(arrays_dir, "meta.json")
+        previous = self._read_arrays_meta(arrays_dir)
+
+        # Les colonnes ne sont jamais réécrites en place : un processus qui les a ouvertes en memmap
+        # recevrait SIGBUS. Chaque écriture crée une nouvelle version, puis meta.json est remplacé
+        # atomiquement pour pointer dessus ; les memmaps ouverts gardent l'ancien inode
+        version = f"v{time.time_ns()}"
+        os.makedirs(os.path.join(arrays_dir, version))
+        columns = {"date": df.index.asi8 // 10**6}
+        columns.update({col: df[col].to_numpy(dtype=np.float64) for col in ExchangeDataManager.OHLCV_COLUMNS})
+        for name, values in columns.items():
+            np.save(os.path.join(arrays_dir, version, f"{name}.npy"), np.ascontiguousarray(values))
+
+        meta = {
+            "coin": coin,
+            "interval": interval,
+            "version": version,
+            "rows": len(df),
+            "columns": list(columns),
+            "dtypes": {name: str(values.dtype) for name, values in columns.items()},
+            "first": int(columns["date"][0]) if len(df) else None,
+            "last": int(columns["date"][-1]) if len(df) else None,
+        }
+        self._write_atomic(meta_file, lambda f: json.dump(meta, f))
+
+        # La version précédente est gardée pour un lecteur qui viendrait de lire l'ancien meta.json,
+        # les plus anciennes sont supprimées (les memmaps encore ouverts restent valides)
+        keep = {version, previous.get("version") if previous else None}
+        for name in os.listdir(arrays_dir):
+            path = os.path.join(arrays_dir, name)
+            if os.path.isdir(path) and name not in keep:
+                shutil.rmtree(path)
+            elif name.endswith(".npy") and (previous is None or previous.get("version") is not None):
+                # Colonnes d'avant les versions, à la racine du dossier
+                os.remove(path)
+
+        return arrays_dir
+
+    @staticmethod
+    def _read_arrays_meta(arrays_dir):
+        try:
+            with open(os.path.join(arrays_dir, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_arrays(self, coin, interval, start=None, end=None):
+        """
+        Renvoie les colonnes OHLCV en np.memmap (lecture seule) entre start et end inclus. Les pages
+        sont partagées par tous les processus qui lisent le même fichier via le cache de l'OS.
+
+        :param coin: la paire, ex. BTC/USDT
+        :param interval: l'intervalle, ex. 1m
+        :param start: date de début (str, datetime ou timestamp en ms), le début des données par défaut
+        :param end: date de fin (str, datetime ou timestamp en ms), la fin des données par défaut
+        :return: dict colonne -> np.memmap, "date" étant le timestamp en ms
+        """
+        arrays_dir = self.get_arrays_dir(coin, interval)
+        meta = self._read_arrays_meta(arrays_dir)
+        if meta is None:
+            raise FileNotFoundError(f"Pas de colonnes .npy pour {coin} en {interval}, voir persist_arrays")
+
+        # Les colonnes écrites avant les versions sont à la racine du dossier
+        columns_dir = os.path.join(arrays_dir, meta.get("version", ""))
+        arrays = {name: np.load(os.path.join(columns_dir, f"{name}.npy"), mmap_mode="r") for name in meta["columns"]}
+
+        # Recherche dichotomique sur la colonne date triée
+        dates = arrays["date"]
+        first = 0 if start is None else int(np.searchsorted(dates, self._to_ms(start), side="left"))
+        last = len(dates) if end is None else int(np.searchsorted(dates, self._to_ms(end), side="right"))
+
+        return {name: values[first:last] for name, values in arrays.items()}
+
+    @staticmethod
+    def _to_ms(date):
+        if isinstance(date, (int, np.integer)):
+            return int(date)
+        return pd.Timestamp(date).value // 10**6
+
+    def migrate_csv_to_columnar(self, storage="parquet", remove_csv=False):
+        """
+        Convertit en une fois tous les fichiers csv de l'exchange vers un format colonnes
+
+        :param storage: "parquet", "feather" ou "partitioned"
+        :param remove_csv: supprime les fichiers csv une fois convertis
+        :return: la liste des fichiers écrits
+        """
+        if storage == "csv" or storage not in ExchangeDataManager.STORAGES:
+            raise ValueError(f"Format de stockage colonnes {storage} inconnu")
+        extension = ExchangeDataManager.STORAGES[storage]
+
+        converted = []
+        for path, _, files in os.walk(self.path_data):
+            for name in files:
+                if not name.endswith(".csv"):
+                    continue
+                csv_file = os.path.join(path, name)
+                df = self.read_ohlcv(csv_file)
+                df.index = df.index.asi8 // 10**6
+                target = csv_file[:-len(".csv")] + extension
+                self.write_ohlcv(target, df.rename_axis("date").reset_index())
+                self.record_file(target, self.catalog_entry(csv_file, {}).get("pair"))
+                converted.append(target)
+                if remove_csv:
+                    os.remove(csv_file)
+                    if os.path.exists(self._index_file(csv_file)):
+                        os.remove(self._index_file(csv_file))
+                    self.forget_file(csv_file)
+
+        return converted
+
+    # -- Catalogue : une entrée par fichier OHLCV, tenue à jour à chaque écriture --
+
+    def get_catalog_file(self):
+        return f"{self.path_data}/catalog.json"
+
+    def _catalog_key(self, file_name):
+        return os.path.relpath(file_name, self.path_data).replace(os.sep, "/")
+
+    def _load_catalog(self):
+        if self._catalog is None:
+            try:
+                with open(self.get_catalog_file()) as f:
+                    self._catalog = json.load(f)
+            except (OSError, ValueError):
+                self._catalog = {}
+        return self._catalog
+
+    def _catalog_lock(self):
+        # Le catalogue est modifié par les threads qui agrègent depuis load_data
+        return self._file_lock(self.get_catalog_file())
+
+    def _save_catalog(self):
+        with self._catalog_lock():
+            self._write_atomic(self.get_catalog_file(), lambda f: json.dump(self._catalog, f))
+
+    @staticmethod
+    def _md5(file_name):
+        digest = hashlib.md5()
+        with open(file_name, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _file_checksum(file_name, known_parts=None):
+        """
+        Somme md5 d'un fichier OHLCV et l'état de ses parties, {nom: [taille, date de modification,
+        md5]}. Seules les parties dont la taille ou la date de modification a changé depuis
+        known_parts sont relues : en stockage partitionné, un ajout ne relit que les mois touchés
+        """
+        known_parts = known_parts or {}
+        paths = ExchangeDataManager._partitions(file_name) if os.path.isdir(file_name) else [file_name]
+        parts = {}
+        for path in paths:
+            name = os.path.basename(path)
+            file_stat = os.stat(path)
+            known = known_parts.get(name)
+            if known is not None and known[:2] == [file_stat.st_size, file_stat.st_mtime_ns]:
+                parts[name] = known
+            else:
+                parts[name] = [file_stat.st_size, file_stat.st_mtime_ns, ExchangeDataManager._md5(path)]
+        if not os.path.isdir(file_name):
+            return parts[os.path.basename(file_name)][2], parts
+        # Dossier partitionné : somme des sommes de chaque mois
+        digest = hashlib.md5()
+        for name, part in parts.items():
+            digest.update(f"{name}:{part[2]}".encode())
+        return digest.hexdigest(), parts
+
+    @staticmethod
+    def normalize_pair(pair):
+        """
+        Nom ccxt d'une paire (BTC/USDT, BTC/USDT:USDT), qu'il soit donné tel quel ou sous la forme
+        des noms de fichiers (BTC-USDT, BTC-USDT-USDT). Le catalogue ne contient que ces noms
+
+        :param pair: la paire
+        """
+        if pair is None or "/" in pair:
+            return pair
+        base, _, rest = pair.partition("-")
+        if not rest:
+            return pair
+        quote, _, settle = rest.partition("-")
+        return f"{base}/{quote}:{settle}" if settle else f"{base}/{quote}"
+
+    def catalog_entry(self, file_name, default=None):
+        """
+        Renvoie l'entrée du catalogue d'un fichier OHLCV, ou default s'il n'est pas catalogué
+        """
+        return self._load_catalog().get(self._catalog_key(file_name), default)
+
+    def record_file(self, file_name, coin=None, save=True):
+        """
+        Met à jour l'entrée du catalogue d'un fichier OHLCV depuis son index annexe (sans relire
+        les données) : exchange, timeframe, paire, lignes, dates de début et de fin en ms,
+        trous, taille, date de modification et somme md5 du fichier
+
+        :param file_name: le fichier écrit
+        :param coin: la paire, ex. BTC/USDT ; par défaut celle déjà cataloguée ou celle du nom du fichier
+        :param save: réécrit catalog.json
+        """
+        key = self._catalog_key(file_name)
+        index = self.read_index(file_name) or self.build_index(file_name)
+        size, mtime_ns = self._file_stat(file_name)
+        stem = os.path.basename(file_name).rsplit(".", 1)[0]
+        previous = self.catalog_entry(file_name, {})
+        checksum, parts = self._file_checksum(file_name, previous.get("parts"))
+        entry = {
+            "exchange": self.exchange_name,
+            "timeframe": os.path.basename(os.path.dirname(file_name)),
+            "pair": coin,
+            "derived": key.startswith("derived/"),
+            "storage": next(storage for storage, ext in self.STORAGES.items() if file_name.endswith(ext)),
+            "rows": index["rows"],
+            "start": index["first"],
+            "end": index["last"],
+            "gaps": index["gaps"],
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "checksum": checksum,
+            "parts": parts,
+        }
+        with self._catalog_lock():
+            catalog = self._load_catalog()
+            entry["pair"] = self.normalize_pair(coin or catalog.get(key, {}).get("pair", stem))
+            catalog[key] = entry
+            if save:
+                self._save_catalog()
+        return entry
+
+    def forget_file(self, file_name):
+        """
+        Retire un fichier du catalogue
+        """
+        with self._catalog_lock():
+            if self._load_catalog().pop(self._catalog_key(file_name), None) is not None:
+                self._save_catalog()
+
+    def rebuild_catalog(self):
+        """
+        Reconstruit le catalogue depuis les fichiers présents sur le disque, par exemple pour une
+        base téléchargée avant l'existence du catalogue. Les paires déjà cataloguées sont conservées.
+        """
+        extensions = tuple(self.STORAGES.values())
+        found = set()
+        for path, dirs, files in os.walk(self.path_data):
+            # Un dossier partitionné est un seul fichier OHLCV
+            files = files + [name for name in dirs if name.endswith(".parts")]
+            dirs[:] = [name for name in dirs if not name.endswith(".parts")]
+            for name in files:
+                if name.endswith(extensions):
+                    file_name = os.path.join(path, name)
+                    self.record_file(file_name, save=False)
+                    found.add(self._catalog_key(file_name))
+        with self._catalog_lock():
+            self._catalog = {key: entry for key, entry in self._load_catalog().items() if key in found}
+            self._save_catalog()
+        return self.catalog()
+
+    def catalog(self, timeframe=None, pairs=None, storage=None, derived=None):
+        """
+        Interroge le catalogue, sans lire aucun fichier de données
+
+        :param timeframe: ne garde que cet intervalle, ex. 1h
+        :param pairs: ne garde que ces paires
+        :param storage: ne garde que ce format de stockage
+        :param derived: True/False pour ne garder que les intervalles agrégés localement / téléchargés
+        :return: un DataFrame avec une ligne par fichier, dates start et end en UTC
+        """
+        columns = ["exchange", "timeframe", "pair", "derived", "storage", "rows", "start", "end",
+                   "gaps", "size", "mtime_ns", "checksum"]
+        with self._catalog_lock():
+            items = list(self._load_catalog().items())
+        if pairs is not None:
+            pairs = {self.normalize_pair(pair) for pair in pairs}
+        entries = [
+            dict(entry, file=key, pair=self.normalize_pair(entry["pair"])) for key, entry in items
+            if (timeframe is None or entry["timeframe"] == timeframe)
+            and (pairs is None or self.normalize_pair(entry["pair"]) in pairs)
+            and (storage is None or entry["storage"] == storage)
+            and (derived is None or entry["derived"] == derived)
+        ]
+        df = pd.DataFrame(entries, columns=columns + ["file"])
+        df["start"] = pd.to_datetime(df["start"], unit="ms", utc=True)
+        df["end"] = pd.to_datetime(df["end"], unit="ms", utc=True)
         return df
 
+    def needs_refresh(self, timeframe, last_dt, pairs=None):
+        """
+        Renvoie les paires cataloguées dont la dernière bougie en timeframe est antérieure à last_dt
+
+        :param timeframe: l'intervalle, ex. 1h
+        :param last_dt: la date de la dernière bougie voulue, en UTC si elle n'a pas de fuseau
+        :param pairs: restreint la recherche à ces paires ; celles absentes du catalogue sont renvoyées
+        """
+        df = self.catalog(timeframe=timeframe, pairs=pairs, derived=False)
+        # Les dates du catalogue sont en UTC : une date naïve est localisée pour pouvoir les comparer
+        last_dt = pd.Timestamp(last_dt)
+        last_dt = last_dt.tz_localize("UTC") if last_dt.tzinfo is None else last_dt.tz_convert("UTC")
+        stale = df.loc[df["end"] < last_dt, "pair"].tolist()
+        catalogued = set(df["pair"])
+        missing = [pair for pair in pairs or [] if self.normalize_pair(pair) not in catalogued]
+        return stale + missing
+
+    @staticmethod
+    def cache_info():
+        """
+        Renvoie l'état du cache de load_data : nombre de trames en cache, mémoire occupée et
+        maximale en octets, hits, misses et taux de hit
+        """
+        return ExchangeDataManager.LOAD_CACHE.info()
+
     async def download_data(
         self,
         coins,
         intervals,
         start_date="2017-01-01 00:00:00",
-        end_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        end_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        derived_intervals=None
     ):
         """
-        Télécharge les données des API de CEX et les stocke dans des fichiers csv
+        Télécharge les données des API de CEX et les stocke dans des fichiers csv.
+        Toutes les paires et tous les intervalles sont téléchargés en parallèle sur la même session,
+        le débit étant limité par le limiteur de l'exchange (rate_limit requêtes par seconde).
 
         :param coins: une liste de paires pour lesquelles télécharger des données
         :param intervals: liste de chaînes, par ex. ['1h', '1d', '5m']
         :param end_date: la date d'arrêt du téléchargement des données. Si aucun, téléchargera les
         données jusqu'à la date actuelle
+        :param derived_intervals: intervalles à agréger localement depuis les intervalles téléchargés
+        au lieu de les télécharger, par ex. ['2h', '4h', '1d'] avec intervals=['1h']
         """
-        await self.exchange.load_markets()
         start_date = datetime.strptime(start_date, "%Y-%m-%d %H:%M:%S")
         end_date = datetime.strptime(end_date, "%Y-%m-%d %H:%M:%S")
 
+        jobs = []
         for interval in intervals:
-
             all_dt_intervals = list(self.create_intervals(
                 start_date, end_date, self.create_timedelta(interval)))
             last_dt = all_dt_intervals[-1].astimezone(pytz.utc)
 
-            end_timestamp = int(last_dt.timestamp() * 1000)
+            for coin in coins:
+                if self.exchange_name == "bitget" and ":" not in coin:
+                    print(f"Skip {coin} - Can not download spot data on {self.exchange_name}, use futures with 'XXX/USDT:USDT' format")
+                    continue
+                jobs.append((coin, interval, last_dt))
+
+        # Une seule session pour tous les téléchargements, fermée à la fin
+        try:
+            await self.exchange.load_markets()
+            self.pbar = tqdm(total=0)
+            await asyncio.gather(*[self.download_job(coin, interval, last_dt) for coin, interval, last_dt in jobs])
+        finally:
+            if self.pbar is not None:
+                self.pbar.close()
+            await self.exchange.close()
 
+        for interval in derived_intervals or []:
             for coin in coins:
                 try:
-                    if self.exchange_name == "bitget" and ":" not in coin:
-                        print(f"Skip {coin} - Can not download spot data on {self.exchange_name}, use futures with 'XXX/USDT:USDT' format")
-                        continue
-                    print(
-                        f"\tRécupération pour la paire {coin} en timeframe {interval} sur l'exchange {self.exchange_name}...")
-
-                    file_path = f"{self.path_data}/{interval}/"
-                    os.makedirs(file_path, exist_ok=True)
-                    file_name = f"{file_path}{coin.replace('/', '-').replace(':', '-')}.csv"
-
-                    dt_or_false = await self.is_data_missing(file_name, last_dt)
-                    if dt_or_false:
-
-                        # print("\tTéléchargement des données")
-
-                        tasks = []
-                        current_timestamp = int(dt_or_false.timestamp() * 1000)
-
-                        while True:
-                            # tasks.append(asyncio.create_task(self.download_tf(
-                            #     coin, interval, current_timestamp)))
-                            tasks.append(self.download_tf_with_semaphore(coin, interval, current_timestamp, sem))
-                            current_timestamp = min([current_timestamp + self.exchange_dict["limit_size_request"] *
-                                                    self.intervals_dict[interval]["interval_ms"], end_timestamp])
-                            if current_timestamp >= end_timestamp:
-                                break
-                        
-                        
-                        self.pbar = tqdm(tasks)
-                        results = await asyncio.gather(*tasks)
-                        await self.exchange.close()
-                        self.pbar.close()
-
-                        all_df = []
-                        for i in results:
-                            # Si on n'a aucune donnée on ne fait rien
-                            if i:
-                                all_df.append(pd.DataFrame(i))
-
-                        # Si il y a des données
-                        if all_df:
-                            final = pd.concat(all_df, ignore_index=True, sort=False)
-                            final.columns = ['date', 'open',
-                                            'high', 'low', 'close', 'volume']
-                            final.rename(
-                                columns={0: 'date', 1: 'open', 2: 'high', 3: 'low', 4: 'close', 5: 'volume'})
-                            final.set_index('date', drop=False, inplace=True)
-                            final = final[~final.index.duplicated(keep='first')]
-                            if os.path.exists(file_name):
-                                with open(file_name, mode='a') as f:
-                                    final.iloc[1:].to_csv(
-                                        path_or_buf=f, header=False, index=False)
-                            else:
-                                with open(file_name, mode='w') as f:
-                                    final.to_csv(path_or_buf=f, index=False)
-                        else:
-                            print(
-                                f"\tPas de données pour {coin} en {interval} sur cette période")
-                    else:
-                        print("\tDonnées déjà récupérées")
-                        
-                    print("\033[H\033[J", end="")
+                    self.update_derived(coin, interval)
                 except Exception as e:
-                    print(f"Error during download {coin} {interval} {e}")
-                    continue
+                    print(f"Error during resampling {coin} {interval} {e}")
+
+    async def download_job(self, coin, interval, last_dt):
+        """
+        Met à jour le fichier d'une paire sur un intervalle jusqu'à last_dt. Les requêtes de tous
+        les jobs passent par le limiteur de l'exchange.
+
+        :param coin: la paire à télécharger
+        :param interval: l'intervalle, par ex. 1h
+        :param last_dt: la date (UTC) de la dernière bougie voulue
+        """
+        try:
+            os.makedirs(f"{self.path_data}/{interval}/", exist_ok=True)
+            file_name = self.get_file_name(coin, interval)
+
+            dt_or_false = await self.is_data_missing(file_name, last_dt)
+            if not dt_or_false:
+                print(f"\tDonnées déjà récupérées pour {coin} en {interval}")
+                return
+
+            end_timestamp = int(last_dt.timestamp() * 1000)
+            current_timestamp = int(dt_or_false.timestamp() * 1000)
+            tasks = []
+            while True:
+                tasks.append(self.download_tf(coin, interval, current_timestamp))
+                current_timestamp = min([current_timestamp + self.exchange_dict["limit_size_request"] *
+                                        self.intervals_dict[interval]["interval_ms"], end_timestamp])
+                if current_timestamp >= end_timestamp:
+                    break
+
+            self.pbar.total += len(tasks)
+            self.pbar.refresh()
+            results = await asyncio.gather(*tasks)
 
-    async def download_tf_with_semaphore(self, coin, interval, current_timestamp, sem: Semaphore):
-        async with sem:
-            return await self.download_tf(coin, interval, current_timestamp)
+            all_df = []
+            for i in results:
+                # Si on n'a aucune donnée on ne fait rien
+                if i:
+                    all_df.append(pd.DataFrame(i))
+
+            # Si il y a des données
+            if all_df:
+                final = pd.concat(all_df, ignore_index=True, sort=False)
+                final.columns = ['date', 'open',
+                                 'high', 'low', 'close', 'volume']
+                final.set_index('date', drop=False, inplace=True)
+                final = final[~final.index.duplicated(keep='first')]
+                if os.path.exists(file_name):
+                    self.write_ohlcv(file_name, final.iloc[1:], append=True)
+                else:
+                    self.write_ohlcv(file_name, final)
+                self.record_file(file_name, coin)
+                if self.keep_arrays:
+                    self.persist_arrays(coin, interval)
+            else:
+                print(
+                    f"\tPas de données pour {coin} en {interval} sur cette période")
+        except Exception as e:
+            print(f"Error during download {coin} {interval} {e}")
 
     async def download_tf(self, coin, interval, start_timestamp):
         """
         Télécharge les données de l'API et les stocke dans une trame de données.
+        Chaque essai attend un jeton du limiteur de l'exchange ; en cas d'erreur on réessaie
+        après retry_delay secondes, délai doublé à chaque échec.
 
         :param coin: la pièce pour laquelle vous souhaitez télécharger des données
         :param interval: l'intervalle de temps des données que vous souhaitez télécharger
         :param start_timestamp: l'heure de début des données que vous souhaitez télécharger
         """
-        tests = 1
-        while tests < 3:
+        for attempt in range(self.max_retries):
+            await self.rate_limiter.acquire()
             try:
                 if self.exchange_name == "bitget":
                     r = await self.exchange.fetch_ohlcv(coin, timeframe=interval, limit=self.exchange_dict["limit_size_request"], params={"method": "publicMixGetV2MixMarketHistoryCandles", "until": start_timestamp + (self.INTERVALS[interval]["interval_ms"] * self.exchange_dict["limit_size_request"])})
@@ -269,15 +1140,139 @@ class ExchangeDataManager:
                     r = await self.exchange.fetch_ohlcv(
                         symbol=coin, timeframe=interval, since=start_timestamp, limit=self.exchange_dict["limit_size_request"])
 
-                
                 self.pbar.update(1)
                 return r
             except Exception as e:
-                tests += 1
-                if tests == 3:
+                if attempt == self.max_retries - 1:
                     print(f"Error during download {coin} {interval} {start_timestamp} {e}")
-                    # print(coin, start_timestamp, self.exchange_dict["limit_size_request"], {'timeframe': interval})
-                    # raise TooManyError(e)
+                    self.pbar.update(1)
+                    return None
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    def scan_gaps(self, coin, interval, use_index=True):
+        """
+        Cherche les bougies manquantes d'une paire : écarts entre timestamps int64 consécutifs
+        supérieurs à INTERVALS[interval]["interval_ms"], calculés en une passe. Avec use_index, les
+        trous de l'index annexe sont utilisés s'il est à jour, sans lire le fichier.
+
+        :param coin: la paire, ex. BTC/USDT
+        :param interval: l'intervalle, ex. 1h
+        :param use_index: utilise l'index annexe quand il est à jour
+        :return: un DataFrame (start, end, missing) : première et dernière bougie manquante, nombre de bougies
+        """
+        file_name = self.get_file_name(coin, interval)
+        if not os.path.exists(file_name):
+            file_name = self.get_derived_file_name(coin, interval)
+        index = self.read_index(file_name) if use_index else None
+        if index is not None:
+            gaps = index["gaps"]
+        else:
+            dates = np.unique(self.read_raw(file_name)["date"].to_numpy(dtype="int64"))
+            gaps = self._find_gaps(dates, self._interval_ms(file_name))
+
+        df = pd.DataFrame(gaps, columns=["start", "end"], dtype="int64")
+        df["missing"] = (df["end"] - df["start"]) // self.intervals_dict[interval]["interval_ms"] + 1
+        df["start"] = pd.to_datetime(df["start"], unit="ms", utc=True)
+        df["end"] = pd.to_datetime(df["end"], unit="ms", utc=True)
+        return df
+
+    async def backfill_gaps(self, coins, intervals):
+        """
+        Télécharge uniquement les bougies manquantes au milieu des fichiers (voir scan_gaps) et les
+        insère à leur place, sans retélécharger l'historique. Les intervalles agrégés localement
+        depuis ces fichiers sont reconstruits.
+
+        :param coins: une liste de paires
+        :param intervals: liste d'intervalles, par ex. ['1h', '1d']
+        :return: un dict {(paire, intervalle): nombre de bougies ajoutées}
+        """
+        jobs = [
+            (coin, interval) for interval in intervals for coin in coins
+            if os.path.exists(self.get_file_name(coin, interval))
+        ]
+        try:
+            await self.exchange.load_markets()
+            self.pbar = tqdm(total=0)
+            added = await asyncio.gather(*[self.backfill_job(coin, interval) for coin, interval in jobs])
+        finally:
+            if self.pbar is not None:
+                self.pbar.close()
+            await self.exchange.close()
+        return dict(zip(jobs, added))
+
+    async def backfill_job(self, coin, interval):
+        """
+        Comble les trous d'une paire sur un intervalle
+
+        :return: le nombre de bougies ajoutées
+        """
+        try:
+            file_name = self.get_file_name(coin, interval)
+            gaps = (self.read_index(file_name) or self.build_index(file_name))["gaps"]
+            if not gaps:
+                return 0
+
+            # Une requête par tranche de limit_size_request bougies manquantes
+            interval_ms = self.intervals_dict[interval]["interval_ms"]
+            step = self.exchange_dict["limit_size_request"] * interval_ms
+            tasks = [
+                self.download_tf(coin, interval, start)
+                for gap_start, gap_end in gaps for start in range(gap_start, gap_end + 1, step)
+            ]
+            self.pbar.total += len(tasks)
+            self.pbar.refresh()
+            results = await asyncio.gather(*tasks)
+
+            rows = [row for result in results if result for row in result]
+            if not rows:
+                return 0
+            new = pd.DataFrame(rows, columns=['date'] + self.OHLCV_COLUMNS)
+            dates = new["date"].to_numpy(dtype="int64")
+            in_gap = np.zeros(len(new), dtype=bool)
+            for gap_start, gap_end in gaps:
+                in_gap |= (dates >= gap_start) & (dates <= gap_end)
+            new = new[in_gap].drop_duplicates(subset="date")
+            if new.empty:
+                return 0
+
+            # Les bougies sont insérées au milieu du fichier : il est réécrit trié
+            df = pd.concat([self.read_raw(file_name), new], ignore_index=True)
+            df = df.drop_duplicates(subset="date", keep="first").sort_values("date")
+            self.write_ohlcv(file_name, df)
+        except Exception as e:
+            print(f"Error during backfill {coin} {interval} {e}")
+            return 0
+
+        # Le fichier de base est réécrit : les bougies sont comptées même si la suite échoue
+        try:
+            self.record_file(file_name, coin)
+            if self.keep_arrays:
+                self.persist_arrays(coin, interval)
+            self._rebuild_derived(coin, interval)
+        except Exception as e:
+            print(f"Error while updating the files derived from {coin} {interval} after backfill {e}")
+        return len(new)
+
+    def remove_ohlcv(self, file_name):
+        """
+        Supprime un fichier OHLCV quel que soit son stockage (dossier .parts compris), avec son
+        index annexe et son entrée du catalogue
+        """
+        if os.path.isdir(file_name):
+            shutil.rmtree(file_name)
+        elif os.path.exists(file_name):
+            os.remove(file_name)
+        if os.path.exists(self._index_file(file_name)):
+            os.remove(self._index_file(file_name))
+        self.forget_file(file_name)
+
+    def _rebuild_derived(self, coin, base_interval):
+        # Les fichiers agrégés ne sont complétés qu'en fin de fichier : ceux issus de base_interval sont refaits
+        for interval in self.intervals_dict:
+            derived_file = self.get_derived_file_name(coin, interval)
+            if os.path.exists(derived_file) and self.get_base_interval(coin, interval) == base_interval:
+                self.remove_ohlcv(derived_file)
+                self.update_derived(coin, interval, base_interval)
 
     async def is_data_missing(self, file_name, last_dt):
         """
@@ -290,22 +1285,17 @@ class ExchangeDataManager:
         :param start_timestamp: L'horodatage de début des données que vous souhaitez vérifier
         :param end_timestamp: L'horodatage du dernier point de données que vous souhaitez vérifier
         """
-        # On check la première data dispo sur le CEX
-
-        await self.exchange.close()
-
-        if os.path.isfile(file_name):
-            df = pd.read_csv(file_name, index_col=0)
-            df.index = pd.to_datetime(df.index, unit='ms')
-            df = df.groupby(df.index).first()
+        if os.path.exists(file_name):
+            # L'index annexe donne les derniers timestamps sans relire le fichier
+            index = self.read_index(file_name) or self.build_index(file_name)
 
-            if pytz.utc.localize(df.index[-1]) >= last_dt:
+            if pd.Timestamp(index["last"], unit="ms", tz="UTC") >= last_dt:
                 return False
         else:
             # Le fichier n'existe pas, on renvoie la date de début
             return datetime.fromisoformat('2017-01-01')
 
-        return pytz.utc.localize(df.index[-2])
+        return pd.Timestamp(index["previous"] if index["previous"] is not None else index["last"], unit="ms", tz="UTC")
 
     def create_intervals(self, start_date, end_date, delta):
         """
@@ -333,63 +1323,145 @@ class ExchangeDataManager:
         except Exception:
             raise ValueError(f"Intervalle {interval} inconnu")
         
-    def explore_data(self): 
+    def explore_data(self):
+        """
+        Résume les fichiers de tous les exchanges présents dans path_download depuis leurs
+        catalogues (reconstruits s'ils n'existent pas encore), sans lire les données
+        """
         files_data = []
-        for path, subdirs, files in os.walk(self.path_download):
-            for name in files:
-                if os.path.join(path, name).endswith('.csv'):
-                    current_file = os.path.join(path, name)
-                    file_split = current_file.split("\\")
-                    try:
-                        df_file = pd.read_csv(current_file)
-                    except Exception:
-                        continue
-
-                    files_data.append({
-                        "exchange": file_split[1],
-                        "timeframe": file_split[2],
-                        "pair": file_split[3][:-4],
-                        "occurences": len(df_file),
-                        "start_date": str(datetime.fromtimestamp(df_file.iloc[0]["date"]/1000)),
-                        "end_date": str(datetime.fromtimestamp(df_file.iloc[-1]["date"]/1000))
-                    })
-                    
-        return pd.DataFrame(files_data)        
+        root = os.path.dirname(self.path_data)
+        for exchange_name in sorted(os.listdir(root)):
+            if exchange_name not in ExchangeDataManager.CCXT_EXCHANGES:
+                continue
+            manager = self if exchange_name == self.exchange_name else ExchangeDataManager(
+                exchange_name, path_download=self.path_download, storage=self.storage)
+            if os.path.exists(manager.get_catalog_file()):
+                df_catalog = manager.catalog()
+            else:
+                df_catalog = manager.rebuild_catalog()
+            for entry in df_catalog.itertuples():
+                files_data.append({
+                    "exchange": entry.exchange,
+                    "timeframe": entry.timeframe,
+                    "pair": entry.pair,
+                    "occurences": entry.rows,
+                    "start_date": str(entry.start.tz_localize(None)),
+                    "end_date": str(entry.end.tz_localize(None))
+                })
+
+        return pd.DataFrame(files_data)
 
 
 class TooManyError(Exception):
     pass
 
-def volume_based_resampling(df, number_of_candle, normalize=False):
+def _bar_values(df, dollar):
+    volume = df['volume'].to_numpy(dtype=np.float64)
+    return volume * df['close'].to_numpy(dtype=np.float64) if dollar else volume
+
+
+def _segment_bars(df, starts):
+    """Agrège les lignes de df en une bougie par segment commençant aux positions starts"""
+    if len(starts) == 0:
+        return pd.DataFrame(columns=ExchangeDataManager.OHLCV_COLUMNS, index=df.index[:0])
+    ends = np.append(starts[1:], len(df)) - 1
+    return pd.DataFrame({
+        'open': df['open'].to_numpy(dtype=np.float64)[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(dtype=np.float64), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(dtype=np.float64), starts),
+        'close': df['close'].to_numpy(dtype=np.float64)[ends],
+        'volume': np.add.reduceat(df['volume'].to_numpy(dtype=np.float64), starts),
+    }, index=df.index[starts])
+
+
+def _bar_starts(groups):
+    return np.flatnonzero(np.concatenate([[True], groups[1:] != groups[:-1]]))
+
+
+def volume_bars(df, threshold, dollar=False):
+    """
+    Bougies de volume : une nouvelle bougie commence chaque fois que le volume cumulé franchit
+    un multiple de threshold. Calculé en une passe (cumsum puis réductions par segment),
+    sans modifier df.
+
+    :param df: bougies OHLCV indexées par date
+    :param threshold: volume (ou montant en dollars) par bougie
+    :param dollar: cumule volume * close (bougies en dollars) au lieu du volume
+    :return: un DataFrame OHLCV indexé par la date de début de chaque bougie
+    """
+    if len(df) == 0:
+        return _segment_bars(df, np.empty(0, dtype=np.int64))
+    groups = np.floor_divide(np.cumsum(_bar_values(df, dollar)), threshold).astype(np.int64)
+    return _segment_bars(df, _bar_starts(groups))
+
+
+def dollar_bars(df, threshold):
+    """
+    Bougies en dollars : volume_bars sur le montant échangé (volume * close)
+    """
+    return volume_bars(df, threshold, dollar=True)
+
+
+class VolumeBarBuilder:
+    """ Construit des bougies de volume (ou en dollars) morceau par morceau, pour des données
+        trop grandes pour la mémoire : les bougies sont identiques à celles de volume_bars
+        sur les données complètes.
 
-    if normalize:
-        df['sum_volume'] = df['volume'] * df['close']
-    else:
-        df['sum_volume'] = df['volume']
-
-    volume_per_candle = df['sum_volume'].sum() / number_of_candle
-    # Cumuler le volume
-    df['cum_volume'] = df['sum_volume'].cumsum()
-    
-    # Définir un groupe pour chaque nouveau volume cible
-    df['group'] = (df['cum_volume'] // volume_per_candle).astype(int)
-    
-    # Extraire les dates de début pour chaque groupe
-    start_dates = df.groupby('group').apply(lambda x: x.index[0])
-    
-    # Grouper par le groupe et calculer les OHLC pour chaque groupe
-    resampled_df = df.groupby('group').agg({
-        'open': 'first',
-        'high': 'max',
-        'low': 'min',
-        'close': 'last',
-        'volume': 'sum'
-    })
-    
-    # Ajouter les dates de début comme index
-    resampled_df.index = start_dates.values
-    
-    # Supprimer les colonnes temporaires
-    df.drop(['cum_volume', 'group'], axis=1, inplace=True)
-    
-    return resampled_df
+        Exemple :
+            builder = VolumeBarBuilder(threshold)
+            for chunk in chunks:
+                bars.append(builder.update(chunk))
+            bars.append(builder.flush())
+
+        Args:
+            threshold (float): volume (ou montant en dollars) par bougie
+            dollar (bool, optional): cumule volume * close. Defaults to False.
+    """
+
+    def __init__(self, threshold, dollar=False):
+        self.threshold = threshold
+        self.dollar = dollar
+        self.cum_volume = 0.0
+        # Lignes de la dernière bougie, pas encore terminée, et leurs numéros de groupe
+        self.pending = None
+        self.pending_groups = np.empty(0, dtype=np.int64)
+
+    def update(self, chunk):
+        """
+        Ajoute un morceau de bougies (dans l'ordre chronologique)
+
+        :param chunk: bougies OHLCV indexées par date
+        :return: les bougies terminées par ce morceau
+        """
+        if len(chunk) == 0:
+            return _segment_bars(chunk, np.empty(0, dtype=np.int64))
+        # Le cumul repart de la valeur précédente pour reproduire exactement le cumsum global
+        cum = np.cumsum(np.concatenate([[self.cum_volume], _bar_values(chunk, self.dollar)]))[1:]
+        self.cum_volume = cum[-1]
+        groups = np.concatenate([self.pending_groups, np.floor_divide(cum, self.threshold).astype(np.int64)])
+        rows = chunk if self.pending is None else pd.concat([self.pending, chunk[self.pending.columns]])
+
+        # La dernière bougie peut continuer dans le morceau suivant : ses lignes sont gardées de côté
+        starts = _bar_starts(groups)
+        self.pending, self.pending_groups = rows.iloc[starts[-1]:], groups[starts[-1]:]
+        return _segment_bars(rows.iloc[:starts[-1]], starts[:-1])
+
+    def flush(self):
+        """
+        Renvoie la dernière bougie, même incomplète, et remet le constructeur à zéro
+        """
+        if self.pending is None:
+            bars = pd.DataFrame(columns=ExchangeDataManager.OHLCV_COLUMNS)
+        else:
+            bars = _segment_bars(self.pending, np.zeros(1, dtype=np.int64))
+        self.__init__(self.threshold, self.dollar)
+        return bars
+
+
+def volume_based_resampling(df, number_of_candle, normalize=False):
+    """
+    Rééchantillonne df en number_of_candle bougies de volume égal (en dollars si normalize),
+    sans modifier df (voir volume_bars)
+    """
+    threshold = _bar_values(df, normalize).sum() / number_of_candle
+    return volume_bars(df, threshold, dollar=normalize)
@@ -0,0 +1,425 @@
+""" Recursive indicator loops over raw float64 arrays
+
+    Each kernel is compiled with numba on its first call when numba is installed, and runs as
+    a plain Python loop over the arrays otherwise (numba is optional and only imported then).
+    The pandas implementations they replace are kept in custom_indicators as references; the
+    moving average kernels reproduce pandas ewm/rolling and are used by utilities/ma_matrix.py.
+"""
+import importlib.util
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def numba_available():
+    """True when numba is installed, without importing it."""
+    return importlib.util.find_spec("numba") is not None
+
+
+def jit(func):
+    """Compile func with numba.njit on first call, or keep it as is without numba."""
+    compiled = []
+
+    def wrapper(*args):
+        if not compiled:
+            try:
+                from numba import njit
+                compiled.append(njit(cache=True)(func))
+            except ImportError:
+                compiled.append(func)
+        return compiled[0](*args)
+
+    wrapper.py_func = func
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+@jit
+def supertrend_kernel(close, final_upperband, final_lowerband):
+    """
+    SuperTrend direction, adjusting the bands in place.
+
+    :param close: close prices
+    :param final_upperband: hl2 + multiplier * atr, modified in place
+    :param final_lowerband: hl2 - multiplier * atr, modified in place
+    :return: boolean array, True while the trend is up
+    """
+    n = len(close)
+    supertrend = np.ones(n, dtype=np.bool_)
+    for i in range(1, n):
+        if close[i] > final_upperband[i - 1]:
+            supertrend[i] = True
+        elif close[i] < final_lowerband[i - 1]:
+            supertrend[i] = False
+        else:
+            supertrend[i] = supertrend[i - 1]
+            if supertrend[i] and final_lowerband[i] < final_lowerband[i - 1]:
+                final_lowerband[i] = final_lowerband[i - 1]
+            if not supertrend[i] and final_upperband[i] > final_upperband[i - 1]:
+                final_upperband[i] = final_upperband[i - 1]
+
+        # Only the band of the current direction is kept
+        if supertrend[i]:
+            final_upperband[i] = np.nan
+        else:
+            final_lowerband[i] = np.nan
+    return supertrend
+
+
+@jit
+def adaptive_ma_kernel(close, final):
+    """
+    ma[i] = ma[i-1] + final[i]**2 * (close[i] - ma[i-1]), starting from final[0]**2 * close[0].
+    """
+    n = len(close)
+    ma = np.empty(n)
+    if n == 0:
+        return ma
+    ma[0] = (final[0] ** 2) * close[0]
+    for i in range(1, n):
+        ma[i] = ma[i - 1] + (final[i] ** 2) * (close[i] - ma[i - 1])
+    return ma
+
+
+@jit
+def ha_open_kernel(first_open, ha_close):
+    """
+    Heikin Ashi open: ha_open[i] = (ha_open[i-1] + ha_close[i-1]) / 2 from first_open.
+    """
+    n = len(ha_close)
+    ha_open = np.empty(n)
+    if n == 0:
+        return ha_open
+    ha_open[0] = first_open
+    for i in range(1, n):
+        ha_open[i] = (ha_open[i - 1] + ha_close[i - 1]) / 2
+    return ha_open
+
+
+@jit
+def smoothed_ha_open_kernel(smooth_open, smooth_close, ha_close):
+    """
+    Heikin Ashi open of smoothed candles: NaN until the first bar (after the first one) where
+    smooth_open is defined, seeded there with (smooth_open + smooth_close) / 2.
+    """
+    n = len(ha_close)
+    ha_open = np.full(n, np.nan)
+    start = 0
+    for i in range(1, n):
+        if not np.isnan(smooth_open[i]):
+            ha_open[i] = (smooth_open[i] + smooth_close[i]) / 2
+            start = i
+            break
+    for i in range(start + 1, n):
+        ha_open[i] = (ha_open[i - 1] + ha_close[i - 1]) / 2
+    return ha_open
+
+
+@jit
+def ema_kernel(values, alphas, min_periods):
+    """
+    EMA of every column of values for every alpha, with the arithmetic of pandas
+    ewm(alpha, min_periods, adjust=False).mean() (NaN are skipped, not ignored).
+
+    Series are laid out along the last axis so that every pass reads and writes contiguously.
+
+    :param values: (columns x bars) float64, inf already replaced by NaN
+    :param alphas: (windows,) smoothing factors
+    :param min_periods: (windows,) observations needed before a value is output
+    :return: (columns x windows x bars) array
+    """
+    n_cols, n = values.shape
+    n_windows = len(alphas)
+    out = np.empty((n_cols, n_windows, n))
+    if n == 0:
+        return out
+    for c in range(n_cols):
+        for k in range(n_windows):
+            old_wt_factor = 1. - alphas[k]
+            new_wt = alphas[k]
+            minp = max(min_periods[k], 1)
+            weighted = values[c, 0]
+            nobs = 1 if weighted == weighted else 0
+            out[c, k, 0] = weighted if nobs >= minp else np.nan
+            old_wt = 1.
+            for i in range(1, n):
+                cur = values[c, i]
+                is_observation = cur == cur
+                if is_observation:
+                    nobs += 1
+                if weighted == weighted:
+                    old_wt *= old_wt_factor
+                    if is_observation:
+                        # pandas skips the update on constant series to avoid rounding drift
+                        if weighted != cur:
+                            weighted = old_wt * weighted + new_wt * cur
+                            weighted /= (old_wt + new_wt)
+                        old_wt = 1.
+                elif is_observation:
+                    weighted = cur
+                out[c, k, i] = weighted if nobs >= minp else np.nan
+    return out
+
+
+@jit
+def sma_kernel(values, windows):
+    """
+    Rolling mean of every column of values for every window, with the arithmetic of pandas
+    rolling(window).mean(): Kahan-compensated running sum, sign and constant-run corrections.
+
+    :param values: (columns x bars) float64, inf already replaced by NaN
+    :param windows: (windows,) window lengths, also used as min_periods
+    :return: (columns x windows x bars) array
+    """
+    n_cols, n = values.shape
+    n_windows = len(windows)
+    out = np.empty((n_cols, n_windows, n))
+    for c in range(n_cols):
+        for k in range(n_windows):
+            window = windows[k]
+            minp = max(window, 1)
+            sum_x = 0.
+            compensation_add = 0.
+            compensation_remove = 0.
+            nobs = 0
+            neg_ct = 0
+            num_consecutive_same_value = 0
+            prev_value = 0.
+            for i in range(n):
+                s = max(i + 1 - window, 0)
+                if i == 0 or s >= i:
+                    # New window sharing no bar with the previous one (window of 1): restart
+                    prev_value = values[c, s]
+                    num_consecutive_same_value = 0
+                    sum_x = 0.
+                    compensation_add = 0.
+                    compensation_remove = 0.
+                    nobs = 0
+                    neg_ct = 0
+                    first = s
+                else:
+                    # Remove the bar leaving the window
+                    if s > 0:
+                        val = values[c, s - 1]
+                        if val == val:
+                            nobs -= 1
+                            y = - val - compensation_remove
+                            t = sum_x + y
+                            compensation_remove = t - sum_x - y
+                            sum_x = t
+                            if np.signbit(val):
+                                neg_ct -= 1
+                    first = i
+                for j in range(first, i + 1):
+                    val = values[c, j]
+                    if val == val:
+                        nobs += 1
+                        y = val - compensation_add
+                        t = sum_x + y
+                        compensation_add = t - sum_x - y
+                        sum_x = t
+                        if np.signbit(val):
+                            neg_ct += 1
+                        if val == prev_value:
+                            num_consecutive_same_value += 1
+                        else:
+                            num_consecutive_same_value = 1
+                        prev_value = val
+
+                if nobs >= minp and nobs > 0:
+                    result = sum_x / nobs
+                    if num_consecutive_same_value >= nobs:
+                        result = prev_value
+                    elif neg_ct == 0 and result < 0:
+                        result = 0.
+                    elif neg_ct == nobs and result > 0:
+                        result = 0.
+                    out[c, k, i] = result
+                else:
+                    out[c, k, i] = np.nan
+    return out
+
+
+@jit
+def triple_ema_kernel(values, alphas, min_periods):
+    """
+    EMA of the EMA of the EMA of values for every alpha, the three stages advancing together
+    bar by bar, each with the arithmetic of ema_kernel on the output of the previous stage.
+
+    :param values: (bars,) float64, inf already replaced by NaN
+    :return: (windows x bars) array
+    """
+    n = len(values)
+    n_windows = len(alphas)
+    out = np.empty((n_windows, n))
+    weighted = np.empty(3)
+    old_wt = np.empty(3)
+    nobs = np.zeros(3, dtype=np.int64)
+    for k in range(n_windows):
+        old_wt_factor = 1. - alphas[k]
+        new_wt = alphas[k]
+        minp = max(min_periods[k], 1)
+        for i in range(n):
+            cur = values[i]
+            for stage in range(3):
+                is_observation = cur == cur
+                if i == 0:
+                    weighted[stage] = cur
+                    nobs[stage] = 1 if is_observation else 0
+                    old_wt[stage] = 1.
+                else:
+                    if is_observation:
+                        nobs[stage] += 1
+                    if weighted[stage] == weighted[stage]:
+                        old_wt[stage] *= old_wt_factor
+                        if is_observation:
+                            if weighted[stage] != cur:
+                                weighted[stage] = old_wt[stage] * weighted[stage] + new_wt * cur
+                                weighted[stage] /= (old_wt[stage] + new_wt)
+                            old_wt[stage] = 1.
+                    elif is_observation:
+                        weighted[stage] = cur
+                # The next stage reads this stage's output, NaN until min_periods observations
+                cur = weighted[stage] if nobs[stage] >= minp else np.nan
+            out[k, i] = cur
+    return out
+
+
+@jit
+def ema_state_kernel(values, alpha, min_periods, state):
+    """
+    One series of ema_kernel resumed from a saved state, as utilities.streaming.EmaState.
+
+    :param values: (bars,) float64 (inf is treated as NaN)
+    :param state: float64 [started, weighted, old_wt, nobs], updated in place
+    :return: (bars,) EMA values
+    """
+    n = len(values)
+    out = np.empty(n)
+    old_wt_factor = 1. - alpha
+    minp = max(min_periods, 1)
+    started = state[0] != 0
+    weighted = state[1]
+    old_wt = state[2]
+    nobs = state[3]
+    for i in range(n):
+        cur = values[i]
+        if np.isinf(cur):
+            cur = np.nan
+        is_observation = cur == cur
+        if not started:
+            started = True
+            weighted = cur
+            nobs = 1. if is_observation else 0.
+        else:
+            if is_observation:
+                nobs += 1
+            if weighted == weighted:
+                old_wt *= old_wt_factor
+                if is_observation:
+                    if weighted != cur:
+                        weighted = old_wt * weighted + alpha * cur
+                        weighted /= (old_wt + alpha)
+                    old_wt = 1.
+            elif is_observation:
+                weighted = cur
+        out[i] = weighted if nobs >= minp else np.nan
+    state[0] = 1. if started else 0.
+    state[1] = weighted
+    state[2] = old_wt
+    state[3] = nobs
+    return out
+
+
+@jit
+def sma_state_kernel(values, window, buffer, state):
+    """
+    One series of sma_kernel resumed from a saved state, as utilities.streaming.SmaState.
+
+    :param values: (bars,) float64 (inf is treated as NaN)
+    :param buffer: (window,) last values, oldest at state position once full, updated in place
+    :param state: float64 [count, position, sum_x, compensation_add, compensation_remove, nobs,
+        neg_ct, num_consecutive_same_value, prev_value], updated in place
+    :return: (bars,) rolling mean values
+    """
+    n = len(values)
+    out = np.empty(n)
+    minp = max(window, 1)
+    count = int(state[0])
+    position = int(state[1])
+    sum_x = state[2]
+    compensation_add = state[3]
+    compensation_remove = state[4]
+    nobs = state[5]
+    neg_ct = state[6]
+    num_consecutive_same_value = state[7]
+    prev_value = state[8]
+    for i in range(n):
+        val = values[i]
+        if np.isinf(val):
+            val = np.nan
+        reset = False
+        if count < window:
+            reset = count == 0
+            buffer[count] = val
+            count += 1
+        else:
+            if window == 1:
+                reset = True
+            else:
+                old = buffer[position]
+                if old == old:
+                    nobs -= 1
+                    y = - old - compensation_remove
+                    t = sum_x + y
+                    compensation_remove = t - sum_x - y
+                    sum_x = t
+                    if np.signbit(old):
+                        neg_ct -= 1
+            buffer[position] = val
+            position = (position + 1) % window
+        if reset:
+            prev_value = val
+            num_consecutive_same_value = 0
+            sum_x = 0.
+            compensation_add = 0.
+            compensation_remove = 0.
+            nobs = 0
+            neg_ct = 0
+        if val == val:
+            nobs += 1
+            y = val - compensation_add
+            t = sum_x + y
+            compensation_add = t - sum_x - y
+            sum_x = t
+            if np.signbit(val):
+                neg_ct += 1
+            if val == prev_value:
+                num_consecutive_same_value += 1
+            else:
+                num_consecutive_same_value = 1
+            prev_value = val
+
+        if nobs >= minp and nobs > 0:
+            result = sum_x / nobs
+            if num_consecutive_same_value >= nobs:
+                result = prev_value
+            elif neg_ct == 0 and result < 0:
+                result = 0.
+            elif neg_ct == nobs and result > 0:
+                result = 0.
+            out[i] = result
+        else:
+            out[i] = np.nan
+    state[0] = count
+    state[1] = position
+    state[2] = sum_x
+    state[3] = compensation_add
+    state[4] = compensation_remove
+    state[5] = nobs
+    state[6] = neg_ct
+    state[7] = num_consecutive_same_value
+    state[8] = prev_value
+    return out
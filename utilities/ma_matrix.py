@@ -0,0 +1,138 @@
+""" Moving averages over a whole axis of windows at once
+
+    Each function takes one price array (or a bars x columns matrix) and a vector of windows,
+    and returns every moving average in a single array: (bars x windows) for a 1D input,
+    (bars x columns x windows) for a 2D one. Values are bit for bit those of
+    ta.trend.ema_indicator / ta.trend.sma_indicator called window by window.
+
+    With numba the kernels of utilities/kernels.py compute all the windows in one compiled
+    pass; without it each window goes through pandas, which gives the same values.
+"""
+import numpy as np
+import pandas as pd
+
+from utilities.kernels import ema_kernel, numba_available, sma_kernel, triple_ema_kernel
+
+
+def _prepare(values):
+    """
+    (columns x bars) contiguous float64 copy with inf replaced by NaN, as pandas rolling/ewm
+    do, and whether the input was 1D.
+    """
+    arr = np.array(values, dtype=np.float64)
+    squeeze = arr.ndim == 1
+    arr = np.ascontiguousarray(arr[None, :] if squeeze else arr.T)
+    arr[np.isinf(arr)] = np.nan
+    return arr, squeeze
+
+
+def _windows(windows):
+    return np.atleast_1d(np.asarray(windows, dtype=np.int64))
+
+
+def _ema_alphas(windows):
+    # Same arithmetic as pandas ewm(span=window): com = (span - 1) / 2, alpha = 1 / (1 + com)
+    return np.array([1. / (1. + (window - 1) / 2.0) for window in windows])
+
+
+def _pandas_matrix(arr, windows, average):
+    out = np.empty((arr.shape[0], len(windows), arr.shape[1]))
+    for c in range(arr.shape[0]):
+        series = pd.Series(arr[c])
+        for k, window in enumerate(windows):
+            out[c, k] = average(series, int(window)).to_numpy()
+    return out
+
+
+# _ema and _sma map (columns x bars) to (columns x windows x bars)
+def _ema(arr, windows):
+    if numba_available():
+        return ema_kernel(arr, _ema_alphas(windows), windows)
+    return _pandas_matrix(
+        arr, windows, lambda series, window: series.ewm(span=window, min_periods=window, adjust=False).mean())
+
+
+def _sma(arr, windows):
+    if numba_available():
+        return sma_kernel(arr, windows)
+    return _pandas_matrix(
+        arr, windows, lambda series, window: series.rolling(window=window, min_periods=window).mean())
+
+
+def ema_matrix(values, windows):
+    """
+    EMA of values for every window, as ta.trend.ema_indicator(values, window).
+
+    :param values: (bars,) or (bars x columns) prices
+    :param windows: sequence of window lengths
+    :return: (bars x windows) or (bars x columns x windows) array
+    """
+    arr, squeeze = _prepare(values)
+    out = _ema(arr, _windows(windows)).transpose(2, 0, 1)
+    return out[:, 0, :] if squeeze else out
+
+
+def sma_matrix(values, windows):
+    """
+    Simple moving average of values for every window, as ta.trend.sma_indicator(values, window).
+
+    :param values: (bars,) or (bars x columns) prices
+    :param windows: sequence of window lengths
+    :return: (bars x windows) or (bars x columns x windows) array
+    """
+    arr, squeeze = _prepare(values)
+    out = _sma(arr, _windows(windows)).transpose(2, 0, 1)
+    return out[:, 0, :] if squeeze else out
+
+
+def triple_ema_matrix(values, windows):
+    """
+    EMA of the EMA of the EMA of values for every window, as the Trix line.
+
+    :param values: (bars,) prices
+    :param windows: sequence of window lengths
+    :return: (bars x windows) array
+    """
+    arr, _ = _prepare(values)
+    windows = _windows(windows)
+    if numba_available():
+        return triple_ema_kernel(arr[0], _ema_alphas(windows), windows).T
+    out = np.empty((len(windows), arr.shape[1]))
+    for k in range(len(windows)):
+        line = arr
+        for _ in range(3):
+            line = _ema(line, windows[k:k + 1])[:, 0, :]
+        out[k] = line[0]
+    return out.T
+
+
+def pct_change_matrix(values):
+    """pandas DataFrame.pct_change() along the bars axis (NaN forward filled first)."""
+    filled = pd.DataFrame(values).ffill().to_numpy()
+    out = np.full(filled.shape, np.nan)
+    out[1:] = filled[1:] / filled[:-1] - 1
+    return out
+
+
+def trix_grid(close, trix_lengths, signal_lengths, signal_type="sma"):
+    """
+    Trix histogram for every (trix_length, signal_length) pair, as Trix(close, ...).get_trix_histo().
+
+    The triple EMA and its percent change are computed once per trix length, the signal line
+    once per (trix length, signal length) in a single matrix call, and the histogram is their
+    difference by broadcasting.
+
+    :param close: (bars,) close prices
+    :param trix_lengths: sequence of trix window lengths
+    :param signal_lengths: sequence of signal window lengths
+    :param signal_type: "sma" or "ema"
+    :return: (bars x trix lengths x signal lengths) array
+    """
+    trix_pct_line = pct_change_matrix(triple_ema_matrix(close, trix_lengths)) * 100
+    if signal_type == "sma":
+        signal = sma_matrix(trix_pct_line, signal_lengths)
+    elif signal_type == "ema":
+        signal = ema_matrix(trix_pct_line, signal_lengths)
+    else:
+        raise ValueError(f"Unknown trix_signal_type {signal_type}")
+    return trix_pct_line[:, :, None] - signal
@@ -0,0 +1,111 @@
+import itertools
+import math
+import numbers
+
+
+class SuccessiveHalving:
+    """ Coarse-to-fine search of a parameter grid by successive halving
+
+        Rung 0 evaluates a coarse subgrid (every stride-th value of each numeric axis) on a
+        short time window. Each following rung keeps the top `keep` fraction by `metric`,
+        adds their neighbours on the grid at half the previous stride and evaluates them
+        all on a longer window, until the last rung runs at full resolution on the whole
+        period. Axes that are not numeric, or have two values or fewer, are never strided;
+        numeric axes are expected in increasing order, neighbours being adjacent values.
+
+        This is a heuristic: a configuration that ranks badly on the short early windows is
+        dropped for good, so how much of the exhaustive top-k is found depends on the data.
+        On synthetic candles keep=0.5 found the exhaustive best in every case tried, while
+        keep=0.25 sometimes settled for a lower metric; lower keep or shorter windows save
+        more backtests at that risk.
+
+        Args:
+            grid(dict): parameter name -> list of values, e.g. the lists of input_data,
+            evaluate(callable): evaluate(params_list, window) -> DataFrame with one row per
+                params dict (same order) and a `metric` column; window is the fraction of
+                the period to backtest, counted back from its end,
+            metric(str): column to rank on, higher is better,
+            keep(float): fraction of the candidates kept at each rung,
+            windows(list): window of each rung, the last one should be 1 (whole period),
+            min_keep(int): candidates kept at least at each rung
+    """
+
+    def __init__(self, grid, evaluate, metric="sharpe_ratio", keep=0.5, windows=(0.25, 0.5, 1), min_keep=1):
+        self.names = list(grid)
+        self.values = [list(grid[name]) for name in self.names]
+        self.evaluate = evaluate
+        self.metric = metric
+        self.keep = keep
+        self.windows = list(windows)
+        self.min_keep = min_keep
+        self.history = []
+
+    @property
+    def full_grid_size(self):
+        return math.prod(len(values) for values in self.values)
+
+    def _strided(self, axis):
+        values = self.values[axis]
+        return len(values) > 2 and all(isinstance(value, numbers.Number) for value in values)
+
+    def _stride(self, rung):
+        return 2 ** (len(self.windows) - 1 - rung)
+
+    def _params(self, point):
+        return {name: values[i] for name, values, i in zip(self.names, self.values, point)}
+
+    def _coarse_grid(self, stride):
+        axes = []
+        for axis, values in enumerate(self.values):
+            if self._strided(axis):
+                # The last value is kept so that the coarse grid spans the whole axis
+                axes.append(sorted(set(range(0, len(values), stride)) | {len(values) - 1}))
+            else:
+                axes.append(range(len(values)))
+        return list(itertools.product(*axes))
+
+    def _neighbours(self, points, step):
+        candidates = {}
+        for point in points:
+            axes = []
+            for axis, i in enumerate(point):
+                if self._strided(axis):
+                    axes.append(sorted({max(i - step, 0), i, min(i + step, len(self.values[axis]) - 1)}))
+                else:
+                    axes.append([i])
+            candidates.update(dict.fromkeys(itertools.product(*axes)))
+        return list(candidates)
+
+    def run(self):
+        """
+        Run every rung, return the results of the last one sorted by metric (best first).
+        """
+        self.history = []
+        candidates = self._coarse_grid(self._stride(0))
+        results = None
+        for rung, window in enumerate(self.windows):
+            results = self.evaluate([self._params(point) for point in candidates], window).reset_index(drop=True)
+            results["rung"] = rung
+            order = results[self.metric].sort_values(ascending=False, na_position="last", kind="stable").index
+            n_keep = min(len(candidates), max(self.min_keep, math.ceil(len(candidates) * self.keep)))
+            survivors = [candidates[i] for i in order[:n_keep]]
+            self.history.append({"rung": rung, "window": window, "backtests": len(candidates), "kept": n_keep})
+            if rung + 1 < len(self.windows):
+                candidates = self._neighbours(survivors, self._stride(rung + 1))
+        return results.loc[order].reset_index(drop=True)
+
+    def report(self):
+        """Backtests run per rung and what was saved compared with the full grid."""
+        full = self.full_grid_size
+        run = sum(rung["backtests"] for rung in self.history)
+        # A backtest on a fraction of the period costs about that fraction of a full one
+        weighted = sum(rung["backtests"] * rung["window"] for rung in self.history)
+        lines = [
+            f"rung {rung['rung']}: {rung['backtests']} backtests on {rung['window']:.0%} of the period, {rung['kept']} kept"
+            for rung in self.history
+        ]
+        lines.append(
+            f"{run} backtests ({weighted:.0f} full-period equivalents) instead of {full}: "
+            f"{full - run} saved ({1 - weighted / full:.1%} of the compute)"
+        )
+        return "\n".join(lines)
@@ -0,0 +1,82 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+class SharedFrame:
+    """ Float DataFrame with a DatetimeIndex published once in shared memory
+
+        The owner process calls SharedFrame.publish(df) and passes the (small, picklable)
+        SharedFrame to its workers, which call attach() to get a DataFrame whose index and
+        columns are read-only views on the shared block: nothing is pickled or copied.
+
+        Layout of the block: int64 index (datetime64[ns], UTC for a tz-aware index) followed by
+        one float64 row per column. The time zone travels with the descriptor.
+    """
+
+    def __init__(self, name, n_rows, columns, index_name=None, tz=None):
+        self.name = name
+        self.n_rows = n_rows
+        self.columns = list(columns)
+        self.index_name = index_name
+        self.tz = tz
+        self._shm = None
+        self._owner = False
+
+    @classmethod
+    def publish(cls, df, columns=None):
+        """
+        Copy df into a new shared memory block.
+
+        :param df: DataFrame indexed by a DatetimeIndex
+        :param columns: columns to publish, all of them by default
+        """
+        columns = list(df.columns) if columns is None else list(columns)
+        n_rows = len(df)
+        shm = shared_memory.SharedMemory(create=True, size=max(8 * n_rows * (1 + len(columns)), 1))
+
+        shared = cls(shm.name, n_rows, columns, df.index.name, df.index.tz)
+        shared._shm = shm
+        shared._owner = True
+        index, values = shared._arrays(shm)
+        index[:] = df.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        values[:] = df[columns].to_numpy(dtype=np.float64).T
+        return shared
+
+    def _arrays(self, shm):
+        index = np.ndarray((self.n_rows,), dtype=np.int64, buffer=shm.buf)
+        values = np.ndarray((len(self.columns), self.n_rows), dtype=np.float64, buffer=shm.buf, offset=8 * self.n_rows)
+        return index, values
+
+    def attach(self):
+        """Return a read-only DataFrame backed by the shared block (no copy)."""
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(name=self.name)
+        index, values = self._arrays(self._shm)
+        index.flags.writeable = False
+        values.flags.writeable = False
+        dates = pd.DatetimeIndex(index.view("datetime64[ns]"), name=self.index_name)
+        if self.tz is not None:
+            dates = dates.tz_localize("UTC").tz_convert(self.tz)
+        # values.T is (rows x columns) in Fortran order, which pandas keeps as a single block view
+        return pd.DataFrame(values.T, index=dates, columns=self.columns, copy=False)
+
+    def close(self):
+        """Detach from the block, and free it when called by the publishing process."""
+        if self._shm is None:
+            return
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __getstate__(self):
+        # Only the block name travels to the workers, never the data nor the handle
+        return {
+            "name": self.name, "n_rows": self.n_rows, "columns": self.columns, "index_name": self.index_name,
+            "tz": self.tz,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
@@ -0,0 +1,282 @@
+""" Incremental indicator states, advanced one candle at a time
+
+    Each state keeps only what the next value depends on (a few floats, plus the window for
+    a simple moving average), so update(close) costs O(1) time and memory whatever the
+    history length. The arithmetic is the one of pandas ewm / rolling mean / pct_change as
+    used by ta and Trix, in the same order, so the values are bit for bit those of the batch
+    computation over the same history.
+
+    A state is seeded from a historical warm-up with warm_up(closes), which runs the same loop
+    over the whole history in one compiled kernel (utilities/kernels.py), then fed live candles:
+
+        trix = TrixState(trix_length=9, trix_signal_length=21, trix_signal_type="sma")
+        trix.warm_up(df["close"])
+        histo = trix.update(new_close)
+
+    States only hold floats and lists, they can be pickled to resume later.
+"""
+import math
+
+import numpy as np
+
+from utilities.kernels import ema_state_kernel, sma_state_kernel
+
+
+def _array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _clean(value):
+    # pandas rolling/ewm treat inf as missing
+    value = float(value)
+    return math.nan if math.isinf(value) else value
+
+
+class EmaState:
+    """ ta.trend.ema_indicator(close, window), i.e. ewm(span=window, min_periods=window, adjust=False).mean()
+
+        Args:
+            window(int): the EMA window
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        # Same arithmetic as pandas ewm(span=window): com = (span - 1) / 2, alpha = 1 / (1 + com)
+        self.alpha = 1. / (1. + (window - 1) / 2.0)
+        self.min_periods = max(window, 1)
+        self.weighted = math.nan
+        self.old_wt = 1.
+        self.nobs = 0
+        self.started = False
+        self.value = math.nan
+
+    def update(self, close: float) -> float:
+        cur = _clean(close)
+        is_observation = cur == cur
+        if not self.started:
+            self.started = True
+            self.weighted = cur
+            self.nobs = int(is_observation)
+        else:
+            self.nobs += is_observation
+            if self.weighted == self.weighted:
+                self.old_wt *= 1. - self.alpha
+                if is_observation:
+                    # pandas skips the update on constant series to avoid rounding drift
+                    if self.weighted != cur:
+                        weighted = self.old_wt * self.weighted + self.alpha * cur
+                        self.weighted = weighted / (self.old_wt + self.alpha)
+                    self.old_wt = 1.
+            elif is_observation:
+                self.weighted = cur
+        self.value = self.weighted if self.nobs >= self.min_periods else math.nan
+        return self.value
+
+    def warm_up(self, closes) -> np.ndarray:
+        """Feed a history, return the values of every bar."""
+        state = np.array([float(self.started), self.weighted, self.old_wt, float(self.nobs)])
+        values = ema_state_kernel(_array(closes), self.alpha, self.min_periods, state)
+        self.started = bool(state[0])
+        self.weighted = float(state[1])
+        self.old_wt = float(state[2])
+        self.nobs = int(state[3])
+        if len(values):
+            self.value = float(values[-1])
+        return values
+
+
+class SmaState:
+    """ ta.trend.sma_indicator(close, window), i.e. rolling(window, min_periods=window).mean()
+
+        Keeps the last `window` values to remove them from the compensated running sum.
+
+        Args:
+            window(int): the SMA window
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.min_periods = max(window, 1)
+        self.buffer = []
+        self.position = 0
+        self.sum_x = 0.
+        self.compensation_add = 0.
+        self.compensation_remove = 0.
+        self.nobs = 0
+        self.neg_ct = 0
+        self.num_consecutive_same_value = 0
+        self.prev_value = 0.
+        self.value = math.nan
+
+    def _reset(self, first_value):
+        self.prev_value = first_value
+        self.num_consecutive_same_value = 0
+        self.sum_x = 0.
+        self.compensation_add = 0.
+        self.compensation_remove = 0.
+        self.nobs = 0
+        self.neg_ct = 0
+
+    def _add(self, val):
+        if val != val:
+            return
+        self.nobs += 1
+        y = val - self.compensation_add
+        t = self.sum_x + y
+        self.compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1., val) < 0:
+            self.neg_ct += 1
+        if val == self.prev_value:
+            self.num_consecutive_same_value += 1
+        else:
+            self.num_consecutive_same_value = 1
+        self.prev_value = val
+
+    def _remove(self, val):
+        if val != val:
+            return
+        self.nobs -= 1
+        y = - val - self.compensation_remove
+        t = self.sum_x + y
+        self.compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1., val) < 0:
+            self.neg_ct -= 1
+
+    def update(self, close: float) -> float:
+        val = _clean(close)
+        if len(self.buffer) < self.window:
+            if not self.buffer:
+                self._reset(val)
+            self.buffer.append(val)
+        else:
+            if self.window == 1:
+                # pandas restarts the sums when the new window shares no bar with the previous one
+                self._reset(val)
+            else:
+                self._remove(self.buffer[self.position])
+            self.buffer[self.position] = val
+            self.position = (self.position + 1) % self.window
+        self._add(val)
+
+        if self.nobs >= self.min_periods and self.nobs > 0:
+            result = self.sum_x / self.nobs
+            if self.num_consecutive_same_value >= self.nobs:
+                result = self.prev_value
+            elif self.neg_ct == 0 and result < 0:
+                result = 0.
+            elif self.neg_ct == self.nobs and result > 0:
+                result = 0.
+            self.value = result
+        else:
+            self.value = math.nan
+        return self.value
+
+    def warm_up(self, closes) -> np.ndarray:
+        """Feed a history, return the values of every bar."""
+        buffer = np.full(self.window, np.nan)
+        buffer[:len(self.buffer)] = self.buffer
+        state = np.array([
+            len(self.buffer), self.position, self.sum_x, self.compensation_add, self.compensation_remove,
+            self.nobs, self.neg_ct, self.num_consecutive_same_value, self.prev_value,
+        ], dtype=np.float64)
+        values = sma_state_kernel(_array(closes), self.window, buffer, state)
+        self.buffer = buffer[:int(state[0])].tolist()
+        self.position = int(state[1])
+        self.sum_x, self.compensation_add, self.compensation_remove = (float(x) for x in state[2:5])
+        self.nobs, self.neg_ct, self.num_consecutive_same_value = (int(x) for x in state[5:8])
+        self.prev_value = float(state[8])
+        if len(values):
+            self.value = float(values[-1])
+        return values
+
+
+class TrixState:
+    """ Trix indicator, one candle at a time
+
+        Same lines as custom_indicators.Trix: trix_line (triple EMA), trix_pct_line
+        (pct_change * 100), trix_signal_line (SMA or EMA of the pct line) and trix_histo.
+
+        Args:
+            trix_length(int): the window length for each mooving average of the trix,
+            trix_signal_length(int): the window length for the signal line,
+            trix_signal_type(str): "sma" or "ema"
+    """
+
+    def __init__(self, trix_length: int = 9, trix_signal_length: int = 21, trix_signal_type: str = "sma"):
+        if trix_signal_type not in ("sma", "ema"):
+            raise ValueError(f"Unknown trix_signal_type {trix_signal_type}")
+        self.trix_length = trix_length
+        self.trix_signal_length = trix_signal_length
+        self.trix_signal_type = trix_signal_type
+        self.emas = [EmaState(trix_length) for _ in range(3)]
+        self.signal = SmaState(trix_signal_length) if trix_signal_type == "sma" else EmaState(trix_signal_length)
+        # Last non NaN trix_line value: pct_change forward fills before dividing
+        self.last_trix = math.nan
+        self.started = False
+        self.trix_line = math.nan
+        self.trix_pct_line = math.nan
+        self.trix_signal_line = math.nan
+        self.trix_histo = math.nan
+
+    def update(self, close: float) -> float:
+        """Advance by one candle, return the new trix_histo value."""
+        line = close
+        for ema in self.emas:
+            line = ema.update(line)
+        self.trix_line = line
+
+        filled = line if line == line else self.last_trix
+        if self.started:
+            if self.last_trix == 0:
+                # numpy division: x / 0 gives inf (or NaN) as in the batch pct_change, not an error
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    self.trix_pct_line = float(np.float64(filled) / self.last_trix - 1) * 100
+            else:
+                self.trix_pct_line = (filled / self.last_trix - 1) * 100
+        self.started = True
+        self.last_trix = filled
+
+        self.trix_signal_line = self.signal.update(self.trix_pct_line)
+        self.trix_histo = self.trix_pct_line - self.trix_signal_line
+        return self.trix_histo
+
+    def warm_up(self, closes) -> np.ndarray:
+        """Feed a history, return the trix_histo of every bar."""
+        line = _array(closes)
+        if len(line) == 0:
+            return line
+        for ema in self.emas:
+            line = ema.warm_up(line)
+
+        # Forward fill from the last known value, then divide each bar by the previous one
+        rows = np.where(line == line, np.arange(len(line)), -1)
+        np.maximum.accumulate(rows, out=rows)
+        filled = np.where(rows >= 0, line[np.maximum(rows, 0)], self.last_trix)
+        previous = np.concatenate([[self.last_trix], filled[:-1]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct_line = (filled / previous - 1) * 100
+        if not self.started:
+            pct_line[0] = np.nan
+        self.started = True
+        self.last_trix = float(filled[-1])
+
+        signal_line = self.signal.warm_up(pct_line)
+        histo = pct_line - signal_line
+        self.trix_line = float(line[-1])
+        self.trix_pct_line = float(pct_line[-1])
+        self.trix_signal_line = float(signal_line[-1])
+        self.trix_histo = float(histo[-1])
+        return histo
+
+
+class LongMaState(EmaState):
+    """ Long EMA filter of the Trix strategy: ta.trend.ema_indicator(close, window=long_ma_length)
+
+        Args:
+            long_ma_length(int): the EMA window
+    """
+
+    def __init__(self, long_ma_length: int = 500):
+        super().__init__(long_ma_length)
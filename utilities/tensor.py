@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+
+class AlignedTensor:
+    """ Several pairs of one timeframe stacked on a shared timestamp axis
+
+        values[t, p, f] is field f of pair p at bar index[t], NaN where the pair has no bar.
+        valid[t, p] tells whether pair p has a bar at index[t], and listed[t, p] whether
+        index[t] is at or after the first bar of pair p (False before a pair is listed).
+    """
+
+    def __init__(self, index, pairs, fields, values, valid, listed=None):
+        self.index = index
+        self.pairs = list(pairs)
+        self.fields = list(fields)
+        self.values = values
+        self.valid = valid
+        self.listed = listed if listed is not None else np.maximum.accumulate(valid, axis=0)
+
+    @classmethod
+    def from_frames(cls, frames, fields=None):
+        """
+        Align DataFrames indexed by a DatetimeIndex on the union of their timestamps.
+
+        :param frames: dict pair -> DataFrame
+        :param fields: columns to stack, all the columns of the first frame by default
+        """
+        pairs = list(frames)
+        fields = list(fields) if fields is not None else list(next(iter(frames.values())).columns)
+        stamps = [frames[pair].index.asi8 for pair in pairs]
+        timeline = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+
+        values = np.full((len(timeline), len(pairs), len(fields)), np.nan)
+        valid = np.zeros((len(timeline), len(pairs)), dtype=bool)
+        for p, pair in enumerate(pairs):
+            rows = np.searchsorted(timeline, stamps[p])
+            values[rows, p, :] = frames[pair][fields].to_numpy(dtype=np.float64)
+            valid[rows, p] = True
+
+        index = pd.DatetimeIndex(timeline.view("datetime64[ns]"), name="date")
+        return cls(index, pairs, fields, values, valid)
+
+    def field(self, name):
+        """(time x pair) view of one field."""
+        return self.values[:, :, self.fields.index(name)]
+
+    def pair(self, name):
+        """DataFrame of one pair, restricted to the bars it has."""
+        p = self.pairs.index(name)
+        rows = self.valid[:, p]
+        return pd.DataFrame(self.values[rows, p, :], index=self.index[rows], columns=self.fields)
+
+    def loc(self, start=None, end=None):
+        """Tensor restricted to the bars between start and end (both included)."""
+        rows = self.index.slice_indexer(start, end)
+        return AlignedTensor(
+            self.index[rows], self.pairs, self.fields, self.values[rows], self.valid[rows], self.listed[rows])
+
+    @property
+    def shape(self):
+        return self.values.shape
@@ -6,6 +6,7 @@ from utilities.data_manager import ExchangeDataManager
 from utilities.custom_indicators import Trix, TrixVBT
 from utilities.my_utils import compare_multiindex_levels
 from utilities.bt_analysis import get_metrics
+from utilities.cache import indicator_cache
 from utilities.plot_analysis import plot_equity_vs_asset, plot_bar_by_month
 import ta
 import pandas as pd
@@ -48,7 +49,9 @@ class Strategy:
             trix_length=self.params["trix_length"],
             trix_signal_length=self.params["trix_signal_length"],
             trix_signal_type=self.params["trix_signal_type"],
-            long_ma_length=self.params["long_ma_length"]
+            long_ma_length=self.params["long_ma_length"],
+            cache=indicator_cache,
+            timeframe=self.tf
         )
 
     def populate_buy_sell(self):